@@ -0,0 +1,99 @@
+"""
+Import-time benchmark for the Buchfink CLI
+
+Runs `buchfink --help` and `buchfink list` (against a copy of a test scenario)
+under `python -X importtime` and reports the total import time as well as the
+slowest imports. Exits with a non-zero status if one of the commands exceeds
+its budget, so that it can be used as a check.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-help 0.3 --budget-list 2.5
+"""
+import argparse
+import os.path
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from tabulate import tabulate
+
+SCENARIOS = os.path.join(os.path.dirname(__file__), '..', 'tests', 'scenarios')
+
+CHILD = '''
+import sys
+from buchfink.cli import buchfink
+buchfink(sys.argv[1:], obj={})
+'''
+
+# import time: self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure_imports(directory, args):
+    'Returns a list of (module, depth, cumulative seconds) for all imports'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD] + args,
+        cwd=directory,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is not None:
+            # Nested imports are indented by two spaces per level
+            depth = (len(match.group(3)) + 1) // 2
+            imports.append((match.group(4), depth, int(match.group(2)) / 1e6))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenario', default='ethereum_gas')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    parser.add_argument('--budget-help', type=float, default=0.5,
+                        help='Import budget for `buchfink --help` in seconds')
+    parser.add_argument('--budget-list', type=float, default=3.0,
+                        help='Import budget for `buchfink list` in seconds')
+    opts = parser.parse_args()
+
+    budgets = [(['--help'], opts.budget_help), (['list'], opts.budget_list)]
+    failed = False
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = os.path.join(tmp_dir, 'buchfink')
+        shutil.copytree(os.path.join(SCENARIOS, opts.scenario), directory)
+
+        # Warm up, so that neither bytecode compilation nor the creation of
+        # the databases in .buchfink/ end up in the measurements
+        measure_imports(directory, ['list'])
+
+        for args, budget in budgets:
+            imports = measure_imports(directory, args)
+            total = sum(seconds for _, depth, seconds in imports if depth == 1)
+            command = ' '.join(['buchfink'] + args)
+            status = 'ok' if total <= budget else 'OVER BUDGET'
+            failed = failed or total > budget
+
+            print(f'{command}: {total:.3f}s imports (budget {budget:.3f}s) {status}')
+            # Show the direct imports of the top-level modules, e.g. what
+            # buchfink.cli pulls in, rather than just buchfink.cli itself
+            slowest = sorted(
+                [imp for imp in imports if imp[1] == 2], key=lambda imp: imp[2], reverse=True
+            )[:opts.top]
+            print(tabulate(
+                [[module, round(seconds, 3)] for module, _, seconds in slowest],
+                headers=['Module', 'Cumulative (s)']
+            ))
+            print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Scaling benchmark for parsing account files with `--jobs`
+
+Generates a data directory with many file accounts, each holding a trades file
+of the given size, and runs `buchfink trades --jobs N` for an increasing
+number of processes. The events cache is cleared before every run, so that
+all files have to be parsed. Reports the time spent in the command and the
+speedup over a single process.
+
+    python benchmarks/parallel_load.py
+    python benchmarks/parallel_load.py --accounts 300 --trades 2000 --jobs 1 2 4 8 16 32
+"""
+import argparse
+import json
+import os
+import os.path
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import yaml
+from tabulate import tabulate
+
+CHILD = '''
+import sys
+from buchfink.cli import buchfink
+buchfink(sys.argv[1:], obj={})
+'''
+
+ASSETS = ['ETH', 'BTC', 'USDC', 'DAI']
+
+
+def generate_trades(rng, num_trades):
+    trades = []
+    for _ in range(num_trades):
+        trades.append({
+            rng.choice(['buy', 'sell']): '{0} {1}'.format(
+                round(rng.random() * 10, 8), rng.choice(ASSETS)
+            ),
+            'for': '{0} USD'.format(round(rng.random() * 10000, 2)),
+            'fee': '0 USD',
+            'link': '{0:064x}'.format(rng.getrandbits(256)),
+            'timestamp': '20{0:02d}-{1:02d}-{2:02d}T12:00:00+00:00'.format(
+                rng.randint(15, 22), rng.randint(1, 12), rng.randint(1, 28)
+            ),
+        })
+    return {'trades': trades}
+
+
+def generate_directory(directory, num_accounts, num_trades):
+    rng = random.Random(42)
+    accounts = []
+    for i in range(num_accounts):
+        name = f'account{i}'
+        accounts.append({'name': name, 'file': f'{name}.yaml'})
+        with open(os.path.join(directory, f'{name}.yaml'), 'w') as trades_file:
+            yaml.dump(generate_trades(rng, num_trades), trades_file, Dumper=yaml.SafeDumper)
+
+    with open(os.path.join(directory, 'buchfink.yaml'), 'w') as config_file:
+        yaml.dump({
+            'accounts': accounts,
+            'settings': {'main_currency': 'USD'}
+        }, config_file, Dumper=yaml.SafeDumper)
+
+
+def run_trades(directory, jobs):
+    'Returns the wall time of `buchfink trades` with a cold events cache'
+    for cache in ('events', 'index'):
+        shutil.rmtree(os.path.join(directory, '.buchfink', cache), ignore_errors=True)
+
+    timings_file = os.path.join(directory, 'timings.json')
+    subprocess.run(
+        [sys.executable, '-c', CHILD, '--no-daemon', '--timings-file', timings_file,
+            'trades', '--jobs', str(jobs)],
+        cwd=directory,
+        check=True,
+        stdout=subprocess.DEVNULL
+    )
+    with open(timings_file, 'r') as timings_f:
+        timings = {timing['phase']: timing for timing in json.load(timings_f)}
+    return timings['cli.trades']['wall']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--trades', type=int, default=1000, help='Trades per account')
+    parser.add_argument('--jobs', type=int, nargs='+', default=None,
+                        help='Numbers of processes to run with (default: powers of two)')
+    opts = parser.parse_args()
+
+    jobs_list = opts.jobs
+    if jobs_list is None:
+        jobs_list = [1]
+        while jobs_list[-1] * 2 <= (os.cpu_count() or 1):
+            jobs_list.append(jobs_list[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = os.path.join(tmp_dir, 'buchfink')
+        os.mkdir(directory)
+        generate_directory(directory, opts.accounts, opts.trades)
+
+        # Warm up, so that the creation of the databases in .buchfink/ does
+        # not end up in the measurements
+        run_trades(directory, 1)
+
+        table = []
+        baseline = None
+        for jobs in jobs_list:
+            wall = run_trades(directory, jobs)
+            baseline = baseline or wall
+            table.append([jobs, round(wall, 3), round(baseline / wall, 2)])
+
+    print(f'{opts.accounts} accounts with {opts.trades} trades each')
+    print(tabulate(table, headers=['Jobs', 'trades (s)', 'Speedup']))
+
+
+if __name__ == '__main__':
+    main()
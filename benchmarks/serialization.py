@@ -0,0 +1,137 @@
+"""
+Throughput benchmark for serialize_events()
+
+Deserializes a mix of ledger actions (of every type the previous
+implementation knew) and fee events, by default 100k of them, and serializes
+them with serialize_events() and with the previous implementation, which
+built the dict with LedgerAction.serialize() and then deleted keys from it.
+Also checks that both produce the same output. Needs a global DB, so a copy
+of the bullrun test scenario is opened in a temporary directory.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --count 1000000
+"""
+import argparse
+import os.path
+import random
+import shutil
+import tempfile
+import time
+
+from tabulate import tabulate
+
+from buchfink.datatypes import FVal, LedgerAction, LedgerActionType
+from buchfink.db import BuchfinkDB
+from buchfink.serialization import (
+    deserialize_actions,
+    serialize_amount,
+    serialize_event,
+    serialize_events,
+    serialize_timestamp
+)
+
+SCENARIO = os.path.join(os.path.dirname(__file__), '..', 'tests', 'scenarios', 'bullrun')
+
+ASSETS = ['ETH', 'BTC', 'USDC', 'DAI']
+
+KINDS = ['income', 'expense', 'loss', 'airdrop', 'gift', 'spend_fee']
+
+LEGACY_KEYS = {
+    LedgerActionType.INCOME: 'income',
+    LedgerActionType.EXPENSE: 'expense',
+    LedgerActionType.LOSS: 'loss',
+    LedgerActionType.AIRDROP: 'airdrop',
+    LedgerActionType.GIFT: 'gift',
+}
+
+
+def generate_actions(count):
+    rng = random.Random(42)
+    actions = []
+    for _ in range(count):
+        kind = rng.choice(KINDS)
+        action = {
+            kind: '{0} {1}'.format(round(rng.random() * 1000, 8), rng.choice(ASSETS)),
+            'timestamp': '2022-{0:02d}-{1:02d}T{2:02d}:13:37+00:00'.format(
+                rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23)
+            ),
+            'link': '{0:064x}'.format(rng.getrandbits(256)),
+        }
+        if kind == 'spend_fee':
+            action['sequence_index'] = 0
+        elif rng.random() < 0.3:
+            action['notes'] = 'Benchmark action'
+        actions.append(action)
+    return actions
+
+
+def legacy_serialize_ledger_action(action):
+    'serialize_ledger_action() before it was table-driven'
+    ser_action = action.serialize()
+    ser_action['timestamp'] = serialize_timestamp(action.timestamp)
+    ser_action[LEGACY_KEYS[action.action_type]] = \
+        serialize_amount(FVal(action.amount), action.asset)
+    del ser_action['asset']
+    del ser_action['amount']
+    del ser_action['action_type']
+    for key in ('identifier', 'location', 'notes', 'link', 'rate', 'rate_asset'):
+        if not ser_action[key]:
+            del ser_action[key]
+    return ser_action
+
+
+def legacy_serialize_events(actions):
+    return [
+        legacy_serialize_ledger_action(action) if
+        isinstance(action, LedgerAction) else
+        serialize_event(action)
+        for action in
+        sorted(actions, key=lambda action: (action.get_timestamp(),))
+    ]
+
+
+def measure(func, events):
+    start = time.perf_counter()
+    result = func(events)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=100000)
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shutil.copytree(SCENARIO, os.path.join(tmp_dir, 'buchfink'))
+        BuchfinkDB(os.path.join(tmp_dir, 'buchfink', 'buchfink.yaml'))
+
+        events, errors = deserialize_actions(generate_actions(opts.count))
+        assert not errors
+
+        runs = [
+            ('build-then-delete', legacy_serialize_events),
+            ('serialize_events', serialize_events),
+        ]
+
+        table = []
+        expected = None
+        baseline = None
+        for name, func in runs:
+            seconds, result = measure(func, events)
+            if expected is None:
+                expected, baseline = result, seconds
+            elif result != expected:
+                raise SystemExit(f'{name} returned different events')
+            table.append([
+                name,
+                round(seconds, 3),
+                round(len(events) / seconds),
+                round(baseline / seconds, 2)
+            ])
+
+    print(f'{len(events)} events')
+    print(tabulate(table, headers=['Serializer', 'Total (s)', 'Events/s', 'Speedup']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Startup benchmark for the Buchfink CLI
+
+Runs a couple of CLI commands against a copy of a test scenario, each in a
+fresh interpreter, and reports the wall time per command. Every command is
+run twice: once with the lazily initialized BuchfinkDB and once with all lazy
+subsystems forced at construction time (which is what BuchfinkDB used to do).
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --repeat 5 --scenario bullrun
+"""
+import argparse
+import os.path
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tabulate import tabulate
+
+SCENARIOS = os.path.join(os.path.dirname(__file__), '..', 'tests', 'scenarios')
+
+COMMANDS = [
+    ['list'],
+    ['trades'],
+    ['actions', '--type', 'income'],
+]
+
+CHILD = '''
+import sys
+from buchfink import db
+
+if sys.argv[1] == 'eager':
+    original_init = db.BuchfinkDB.__init__
+
+    def eager_init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        for name in ('cryptocompare', 'coingecko', 'defillama', 'historian', 'inquirer',
+                'assets_updater', 'etherscan', 'ethereum_inquirer', 'ethereum_manager',
+                'eth_transactions', 'evm_tx_decoder', 'beaconchain'):
+            getattr(self, name)
+
+    db.BuchfinkDB.__init__ = eager_init
+
+from buchfink.cli import buchfink
+buchfink(sys.argv[2:], obj={})
+'''
+
+
+def time_command(directory, mode, args):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-c', CHILD, mode] + args,
+        cwd=directory,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenario', default='ethereum_gas')
+    parser.add_argument('--repeat', type=int, default=3)
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = os.path.join(tmp_dir, 'buchfink')
+        shutil.copytree(os.path.join(SCENARIOS, opts.scenario), directory)
+
+        # Warm up, so that the databases in .buchfink/ exist
+        time_command(directory, 'lazy', ['list'])
+
+        table = []
+        for args in COMMANDS:
+            lazy = statistics.median(
+                time_command(directory, 'lazy', args) for _ in range(opts.repeat)
+            )
+            eager = statistics.median(
+                time_command(directory, 'eager', args) for _ in range(opts.repeat)
+            )
+            table.append([' '.join(args), round(eager, 3), round(lazy, 3),
+                          round(eager - lazy, 3)])
+
+    print(tabulate(table, headers=['Command', 'Eager (s)', 'Lazy (s)', 'Saved (s)']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Timestamp parsing benchmark
+
+Parses timestamps in the form written by serialize_timestamp() (by default
+1M of them, with events of the same transaction sharing their timestamp)
+with dateutil's isoparse, which deserialize_trade() used before, and with
+parse_timestamp() and parse_timestamps(). Also checks that all of them agree.
+
+    python benchmarks/timestamps.py
+    python benchmarks/timestamps.py --count 100000 --per-tx 1
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+
+import dateutil.parser
+from tabulate import tabulate
+
+from buchfink.serialization import parse_timestamp, parse_timestamps
+
+
+def generate_timestamps(count, per_tx):
+    rng = random.Random(42)
+    timestamps = []
+    while len(timestamps) < count:
+        timestamp = datetime.fromtimestamp(rng.randint(1420070400, 1672531200), tz=timezone.utc)
+        timestamps.extend([timestamp.isoformat()] * per_tx)
+    return timestamps[:count]
+
+
+def measure(func, timestamps):
+    start = time.perf_counter()
+    result = func(timestamps)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--per-tx', type=int, default=3, help='Events sharing a timestamp')
+    opts = parser.parse_args()
+
+    timestamps = generate_timestamps(opts.count, opts.per_tx)
+
+    runs = [
+        ('dateutil isoparse', lambda values: [
+            int(dateutil.parser.isoparse(value).timestamp()) for value in values
+        ]),
+        ('parse_timestamp', lambda values: [parse_timestamp(value) for value in values]),
+        ('parse_timestamps', parse_timestamps),
+    ]
+
+    table = []
+    expected = None
+    baseline = None
+    for name, func in runs:
+        parse_timestamp.cache_clear()
+        seconds, result = measure(func, timestamps)
+        if expected is None:
+            expected, baseline = result, seconds
+        elif result != expected:
+            raise SystemExit(f'{name} returned different timestamps')
+        table.append([
+            name,
+            round(seconds, 3),
+            round(seconds / len(timestamps) * 1e9),
+            round(baseline / seconds, 1)
+        ])
+
+    print(f'{len(timestamps)} timestamps, {opts.per_tx} per transaction')
+    print(tabulate(table, headers=['Parser', 'Total (s)', 'Per timestamp (ns)', 'Speedup']))
+
+
+if __name__ == '__main__':
+    main()
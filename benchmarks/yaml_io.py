@@ -0,0 +1,100 @@
+"""
+YAML benchmark for the Buchfink storage format
+
+Generates an actions file of the given size (in the same shape as the files
+in actions/) and measures loading and dumping it with the pure Python
+SafeLoader/SafeDumper and with buchfink.yaml_io, which uses libyaml if it is
+available. Also checks that both produce byte-identical output.
+
+    python benchmarks/yaml_io.py
+    python benchmarks/yaml_io.py --size 10
+"""
+import argparse
+import io
+import random
+import time
+
+import yaml
+from tabulate import tabulate
+
+from buchfink import yaml_io
+
+ASSETS = [
+    'ETH', 'BTC', 'USDC', 'DAI',
+    'UNI[eip155:1/erc20:0x1f9840a85d5aF5bf1D1762F925BDADdC4201F984]'
+]
+
+
+def generate_actions(size_mb):
+    'Generates serialized actions until their YAML is roughly size_mb large'
+    rng = random.Random(42)
+    actions = []
+    approx_size = 0
+    while approx_size < size_mb * 1024 * 1024:
+        kind = rng.choice(['income', 'expense', 'gift', 'spend_fee'])
+        action = {
+            kind: '{0} {1}'.format(round(rng.random() * 1000, 8), rng.choice(ASSETS)),
+            'timestamp': '2022-{0:02d}-{1:02d}T{2:02d}:13:37+00:00'.format(
+                rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23)
+            ),
+            'link': '0x' + ''.join(rng.choice('0123456789abcdef') for _ in range(64)),
+        }
+        if kind == 'spend_fee':
+            action['sequence_index'] = rng.randint(0, 300)
+            action['counterparty'] = 'gas'
+            action['notes'] = 'Burned {0} ETH for gas'.format(round(rng.random(), 8))
+        elif rng.random() < 0.1:
+            action['notes'] = 'Payment for invoice {0}'.format(rng.randint(1, 10000))
+        actions.append(action)
+        approx_size += sum(len(key) + len(str(val)) + 6 for key, val in action.items())
+    return {'actions': actions}
+
+
+def measure(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--size', type=int, default=50, help='Size of actions file in MB')
+    parser.add_argument('--repeat', type=int, default=1)
+    opts = parser.parse_args()
+
+    data = generate_actions(opts.size)
+
+    dump_py, text_py = measure(
+        lambda: yaml.dump(data, Dumper=yaml.SafeDumper, sort_keys=True), opts.repeat
+    )
+    dump_io, text_io = measure(lambda: yaml_io.dump(data, sort_keys=True), opts.repeat)
+
+    if text_py != text_io:
+        raise SystemExit('Output of yaml_io.dump() differs from yaml.SafeDumper')
+
+    load_py, data_py = measure(
+        lambda: yaml.load(io.StringIO(text_py), Loader=yaml.SafeLoader), opts.repeat
+    )
+    load_io, data_io = measure(lambda: yaml_io.load(io.StringIO(text_py)), opts.repeat)
+
+    if data_py != data_io or data_py != data:
+        raise SystemExit('Result of yaml_io.load() differs from yaml.SafeLoader')
+
+    print('{0:.1f} MB, {1} actions, libyaml: {2}'.format(
+        len(text_py) / 1024 / 1024, len(data['actions']), yaml_io.HAS_LIBYAML
+    ))
+    print(tabulate(
+        [
+            ['load', round(load_py, 3), round(load_io, 3), round(load_py / load_io, 1)],
+            ['dump', round(dump_py, 3), round(dump_io, 3), round(dump_py / dump_io, 1)],
+        ],
+        headers=['Operation', 'PyYAML (s)', 'yaml_io (s)', 'Speedup']
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Helpers for the bookkeeping state Buchfink keeps in its cache directory
+(.buchfink/). Like everything else in there, these files can be deleted at any
+time and will be rebuilt, at the cost of redoing the work they helped to skip.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from buchfink import yaml_io
+from buchfink.models import Account, Config
+from buchfink.models.account import accounts_from_config
+
+logger = logging.getLogger(__name__)
+
+# Bump this when the layout of the config cache changes
+CONFIG_CACHE_VERSION = 1
+
+# The pickled config is only valid as long as the models have not changed
+MODEL_SOURCES = [
+    Path(__file__).parent / 'models' / 'account.py',
+    Path(__file__).parent / 'models' / 'config.py',
+]
+
+# Bump this when the layout of the events cache changes
+EVENTS_CACHE_VERSION = 1
+
+# Cached events are only valid as long as the deserialization has not changed
+EVENTS_SOURCES = [
+    Path(__file__).parent / 'serialization.py',
+]
+
+
+def content_hash(*parts: Any) -> str:
+    'Returns a stable hash over the given bytes or JSON-serializable objects'
+    hasher = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode()
+        hasher.update(hashlib.sha256(part).digest())
+    return hasher.hexdigest()
+
+
+def read_state(path: Path) -> Optional[Any]:
+    try:
+        with path.open('r') as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_state(path: Path, state: Any) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('w') as state_file:
+        json.dump(state, state_file, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_config(config_file: Path, cache_directory: Path) -> Tuple[Config, List[Account]]:
+    """
+    Loads and validates the config file. The validated config and the accounts
+    derived from it are pickled to the cache directory and reused as long as
+    the config file has the same mtime and size, or the same content.
+    """
+    cache_path = cache_directory / 'config.pickle'
+    stat = config_file.stat()
+    file_key = [stat.st_mtime_ns, stat.st_size]
+    models_hash = content_hash(*[source.read_bytes() for source in MODEL_SOURCES])
+
+    try:
+        with cache_path.open('rb') as cache_file:
+            cached = pickle.load(cache_file)
+        if cached['version'] != CONFIG_CACHE_VERSION or cached['models_hash'] != models_hash:
+            cached = None
+    except FileNotFoundError:
+        cached = None
+    except Exception:  # pylint: disable=broad-except
+        logger.debug('Ignoring invalid config cache', exc_info=True)
+        cached = None
+
+    if cached is not None and cached['file_key'] == file_key:
+        return cached['config'], cached['accounts']
+
+    contents = config_file.read_bytes()
+    config_hash = content_hash(contents)
+
+    if cached is not None and cached['config_hash'] == config_hash:
+        config, accounts = cached['config'], cached['accounts']
+    else:
+        logger.debug('Parsing config file %s', config_file)
+        config = Config(**yaml_io.load(contents))
+        accounts = accounts_from_config(config)
+
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with tmp_path.open('wb') as cache_file:
+        pickle.dump({
+            'version': CONFIG_CACHE_VERSION,
+            'models_hash': models_hash,
+            'file_key': file_key,
+            'config_hash': config_hash,
+            'config': config,
+            'accounts': accounts
+        }, cache_file)
+    os.replace(tmp_path, cache_path)
+
+    return config, accounts
+
+
+def _load_pickle(path: Path) -> Optional[Any]:
+    try:
+        with path.open('rb') as cache_file:
+            return pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except Exception:  # pylint: disable=broad-except
+        logger.debug('Ignoring invalid cache file %s', path, exc_info=True)
+        return None
+
+
+def _dump_pickle(path: Path, data: Any) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        with tmp_path.open('wb') as cache_file:
+            pickle.dump(data, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:  # pylint: disable=broad-except
+        logger.debug('Unable to write cache file %s', path, exc_info=True)
+        tmp_path.unlink(missing_ok=True)
+        return
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=None)
+def _events_sources_hash() -> str:
+    return content_hash(*[source.read_bytes() for source in EVENTS_SOURCES])
+
+
+def events_file_key(source_file: Path, kind: str, fingerprint: str) -> list:
+    """
+    Returns the key under which data derived from a trades/actions file stays
+    valid: the same file (by mtime and size), parsed the same way (`kind`),
+    with the same deserialization code and the same fingerprint.
+    """
+    stat = os.stat(source_file)
+    return [
+        EVENTS_CACHE_VERSION,
+        _events_sources_hash(),
+        kind,
+        str(Path(source_file).absolute()),
+        stat.st_mtime_ns,
+        stat.st_size,
+        fingerprint
+    ]
+
+
+def _events_cache_entry(directory: Path, source_file: Path, kind: str, fingerprint: str) \
+        -> Tuple[Path, list]:
+    'Returns the cache file for a trades/actions file and the key it is valid for'
+    directory.mkdir(exist_ok=True)
+    source_path = str(Path(source_file).absolute())
+    key = events_file_key(source_file, kind, fingerprint)
+    return directory / (content_hash(kind, source_path)[:32] + '.pickle'), key
+
+
+def load_events(
+        cache_directory: Path,
+        source_file: Path,
+        kind: str,
+        fingerprint: str,
+        parse: Callable[[], List[Any]]
+) -> List[Any]:
+    """
+    Returns the deserialized events of a trades/actions YAML file. The result of
+    `parse` is pickled to the cache directory and reused as long as the file has
+    the same mtime and size and the fingerprint (which should cover everything
+    else the deserialization depends on) did not change. `kind` distinguishes
+    different parses of the same file, e.g. its trades and its actions.
+    """
+    cached = load_cached_events(cache_directory, source_file, kind, fingerprint)
+    if cached is not None:
+        return cached
+
+    cache_path, key = _events_cache_entry(cache_directory / 'events', source_file, kind,
+            fingerprint)
+    logger.debug('Parsing events file %s', source_file)
+    events = parse()
+    _dump_pickle(cache_path, {'key': key, 'events': events})
+    return events
+
+
+def load_cached_events(cache_directory: Path, source_file: Path, kind: str, fingerprint: str) \
+        -> Optional[List[Any]]:
+    """
+    Returns the events of a trades/actions file as cached by `load_events`, or
+    None if there is no cache for the current version of the file.
+    """
+    cache_path, key = _events_cache_entry(cache_directory / 'events', source_file, kind,
+            fingerprint)
+    cached = _load_pickle(cache_path)
+    if cached is not None and cached.get('key') == key:
+        return list(cached['events'])
+    return None
+
+
+def load_index(cache_directory: Path, source_file: Path, kind: str, fingerprint: str) \
+        -> Optional[dict]:
+    """
+    Returns the index of a trades/actions file as passed to `write_index`, or
+    None if there is no index for the current version of the file.
+    """
+    index_path, key = _events_cache_entry(cache_directory / 'index', source_file, kind,
+            fingerprint)
+    cached = _load_pickle(index_path)
+    if cached is not None and cached.get('key') == key:
+        return cached['index']
+    return None
+
+
+def write_index(cache_directory: Path, source_file: Path, kind: str, fingerprint: str,
+        index: dict) -> None:
+    """
+    Stores a small index of a trades/actions file (e.g. which assets occur at
+    which entries), which is valid under the same conditions as the events
+    cache. The index can be read without unpickling or parsing any events.
+    """
+    index_path, key = _events_cache_entry(cache_directory / 'index', source_file, kind,
+            fingerprint)
+    _dump_pickle(index_path, {'key': key, 'index': index})
+
+
+def write_events(
+        cache_directory: Path,
+        events_file: Path,
+        root_key: str,
+        events: List[Any],
+        fingerprint: str,
+        serialize: Callable[[List[Any]], List[dict]]
+) -> None:
+    """
+    Writes the (sorted) events to a YAML file as `{root_key: serialize(events)}`.
+
+    The serialized events of the last write are remembered in the cache
+    directory. If the file was not modified since, and the events only
+    differ by new events at the end, just those are serialized and appended.
+    Otherwise the whole file is written again, still reusing the serialized
+    form of all events that did not change, unless its contents are the same.
+    """
+    written_directory = cache_directory / 'written'
+    written_directory.mkdir(exist_ok=True)
+
+    events_path = str(Path(events_file).absolute())
+    state_path = written_directory / (content_hash(events_path)[:32] + '.pickle')
+    state_key = [EVENTS_CACHE_VERSION, _events_sources_hash(), root_key, fingerprint]
+    event_keys = [repr(event) for event in events]
+
+    state = _load_pickle(state_path)
+    if state is not None and state.get('key') != state_key:
+        state = None
+
+    try:
+        stat = os.stat(events_file)
+        file_key = [stat.st_mtime_ns, stat.st_size]  # type: Optional[List[int]]
+    except FileNotFoundError:
+        file_key = None
+
+    num_written = len(state['event_keys']) if state is not None else 0
+
+    if state is not None and num_written > 0 and state['file_key'] == file_key \
+            and event_keys[:num_written] == state['event_keys']:
+        if num_written == len(event_keys):
+            logger.debug('%s is up to date', events_file)
+            return
+
+        logger.debug('Appending %d event(s) to %s', len(events) - num_written, events_file)
+        serialized = state['serialized'] + serialize(events[num_written:])
+        with open(events_file, 'a') as yaml_file:
+            yaml_io.dump(serialized[num_written:], stream=yaml_file, sort_keys=True)
+
+    else:
+        known = dict(zip(state['event_keys'], state['serialized'])) if state is not None else {}
+        serialized = [
+            known[key] if key in known else serialize([event])[0]
+            for key, event in zip(event_keys, events)
+        ]
+        text = yaml_io.dump({root_key: serialized}, sort_keys=True)
+        if file_key is not None and stat.st_size == len(text.encode()) \
+                and Path(events_file).read_text() == text:
+            logger.debug('%s is unchanged', events_file)
+        else:
+            logger.debug('Writing %d event(s) to %s', len(events), events_file)
+            with open(events_file, 'w') as yaml_file:
+                yaml_file.write(text)
+
+    stat = os.stat(events_file)
+    _dump_pickle(state_path, {
+        'key': state_key,
+        'file_key': [stat.st_mtime_ns, stat.st_size],
+        'event_keys': event_keys,
+        'serialized': serialized
+    })
@@ -4,53 +4,47 @@ import os.path
 import re
 import shutil
 import sys
-import webbrowser
 from datetime import datetime
 from functools import update_wrapper
+from itertools import chain
 from operator import itemgetter
 from pathlib import Path
-from typing import TYPE_CHECKING, List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple, cast
 
 import click
 import coloredlogs
-import pyqrcode
-import yaml
-from rotkehlchen.constants import ZERO
-from rotkehlchen.history.price import PriceHistorian
 from tabulate import tabulate
-from web3.exceptions import CannotHandleRequest
-
-from buchfink.datatypes import FVal, HistoryEventSubType, LedgerAction, Timestamp, Trade
-from buchfink.db import BuchfinkDB
-from buchfink.exceptions import NoPriceForGivenTimestamp
-from buchfink.serialization import (
-    deserialize_ledger_action_type,
-    deserialize_timestamp,
-    serialize_events,
-    serialize_nfts,
-    serialize_timestamp,
-    serialize_trades
-)
 
-from .classification import classify_tx
-from .importers import zerion_csv
-from .models import Account, FetchConfig, ReportConfig
-from .models.account import account_from_string
-from .report import render_report, run_report
+from . import timings
+from .daemon import DAEMON_COMMANDS, BuchfinkDaemon, forward_command
 
+# Most imports are deferred to the commands that need them, so that the CLI
+# starts quickly. See benchmarks/import_time.py.
 if TYPE_CHECKING:
     from typing import Dict, Union  # noqa: F401
 
-    from buchfink.datatypes import Asset  # noqa: F401
+    from buchfink.datatypes import (  # noqa: F401
+        Asset,
+        BalanceSheet,
+        FVal,
+        LedgerAction,
+        Nfts,
+        Timestamp,
+        Trade
+    )
+    from buchfink.db import BuchfinkDB  # noqa: F401
+
+    from .models import Account  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
-epoch_start_ts = Timestamp(int(datetime(2011, 1, 1).timestamp()))
-epoch_end_ts = Timestamp(int(datetime(2031, 1, 1).timestamp()))
+epoch_start_ts = cast('Timestamp', int(datetime(2011, 1, 1).timestamp()))
+epoch_end_ts = cast('Timestamp', int(datetime(2031, 1, 1).timestamp()))
 
 
-def _get_accounts(buchfink_db: BuchfinkDB, external=None, exclude=None,
-        keyword=None, account_type=None) -> List[Account]:
+def _get_accounts(buchfink_db: 'BuchfinkDB', external=None, exclude=None,
+        keyword=None, account_type=None) -> List['Account']:
+    from .models.account import account_from_string
 
     if external:
         accounts = [account_from_string(ext, buchfink_db) for ext in external]
@@ -88,24 +82,82 @@ def _get_accounts(buchfink_db: BuchfinkDB, external=None, exclude=None,
 def with_buchfink_db(func):
     @click.pass_context
     def new_func(ctx, *args, **kwargs):
-        buchfink_db = BuchfinkDB(ctx.obj['BUCHFINK_CONFIG'])
+        if ctx.obj.get('BUCHFINK_DB') is not None:
+            # We are running inside of "buchfink serve", reuse its DB
+            buchfink_db = ctx.obj['BUCHFINK_DB']
+            try:
+                ctx.invoke(func, buchfink_db, *args, **kwargs)
+            finally:
+                # Files may change until the next command, do not keep them
+                buchfink_db.clear_preloaded()
+            return
+
+        if ctx.info_name in DAEMON_COMMANDS and ctx.obj.get('USE_DAEMON', True):
+            response = forward_command(ctx.obj['BUCHFINK_CONFIG'], ctx.info_name, kwargs)
+            if response is not None:
+                output, errors, exit_code = response
+                click.echo(output, nl=False)
+                click.echo(errors, nl=False, err=True)
+                if exit_code:
+                    sys.exit(exit_code)
+                return
+
+        with timings.phase('cli.import_db'):
+            from buchfink.db import BuchfinkDB
+
+        with timings.phase('cli.init_db'):
+            buchfink_db = BuchfinkDB(ctx.obj['BUCHFINK_CONFIG'])
         try:
-            ctx.invoke(func, buchfink_db, *args, **kwargs)
+            with timings.phase(f'cli.{ctx.info_name}'):
+                ctx.invoke(func, buchfink_db, *args, **kwargs)
         finally:
+            buchfink_db.clear_preloaded()
             # Explicitly close connections
-            buchfink_db.__del__()  # pylint: disable=unnecessary-dunder-call
+            with timings.phase('cli.close_db'):
+                buchfink_db.__del__()  # pylint: disable=unnecessary-dunder-call
     return update_wrapper(new_func, func)
 
 
+def _parse_date_option(date: Optional[str]) -> Optional['Timestamp']:
+    'Parses the value of a --from/--to option, e.g. 2021-01-01'
+    if date is None:
+        return None
+    try:
+        return cast('Timestamp', int(datetime.fromisoformat(date).timestamp()))
+    except ValueError as exc:
+        raise click.BadParameter(f'Invalid date: {date}') from exc
+
+
+def _output_timings(show: bool, timings_file: Optional[str]):
+    if show:
+        click.echo(timings.format_timings(), err=True)
+    if timings_file is not None:
+        timings.dump_timings(timings_file)
+        logger.info('Timings have been written to: %s', timings_file)
+
+
 @click.group()
 @click.option('--log-level', '-l', type=str, default='INFO')
 @click.option('--config', help='Buchfink config file', envvar='BUCHFINK_CONFIG')
+@click.option('--no-daemon', is_flag=True,
+        help='Do not forward commands to a running "buchfink serve"')
+@click.option('--timings', 'show_timings', is_flag=True,
+        help='Show the time spent per phase at exit')
+@click.option('--timings-file', type=str, default=None, metavar='FILE',
+        help='Write the time spent per phase as JSON to FILE')
 @click.pass_context
-def buchfink(ctx, log_level, config):
+def buchfink(ctx, log_level, config, no_daemon, show_timings, timings_file):
     ctx.ensure_object(dict)
     ctx.obj['BUCHFINK_CONFIG'] = config or './buchfink.yaml'
+    ctx.obj['USE_DAEMON'] = not no_daemon
     coloredlogs.install(level=log_level, fmt='%(asctime)s %(levelname)s %(message)s')
 
+    if show_timings or timings_file is not None:
+        # Timings are recorded in this process, so do not forward to a daemon
+        ctx.obj['USE_DAEMON'] = False
+        timings.enable()
+        ctx.call_on_close(lambda: _output_timings(show_timings, timings_file))
+
 
 @buchfink.command()
 @click.option('--directory', '-d', type=str, default='.')
@@ -128,6 +180,8 @@ def init(directory):
         logger.debug('Copying %s', init_file.name)
         shutil.copyfile(init_file, bf_dir / init_file.name)
 
+    from buchfink.db import BuchfinkDB
+
     buchfink_db = BuchfinkDB(target_config)
 
     click.echo(
@@ -146,7 +200,7 @@ def init(directory):
         help='Filter by account type')
 @click.option('--output', '-o', type=str, default=None, help='Output field')
 @with_buchfink_db
-def list_(buchfink_db: BuchfinkDB, keyword, account_type, output):
+def list_(buchfink_db: 'BuchfinkDB', keyword, account_type, output):
     "List accounts"
     for account in buchfink_db.get_all_accounts():
         if keyword is not None and keyword not in account.name:
@@ -167,6 +221,7 @@ def list_(buchfink_db: BuchfinkDB, keyword, account_type, output):
             click.echo(type_and_name + address + tags)
         elif output == 'qrcode':
             if account.address:
+                import pyqrcode
                 qrcode = pyqrcode.create(account.address)
                 click.echo(qrcode.terminal(quiet_zone=1))
             else:
@@ -190,21 +245,28 @@ def list_(buchfink_db: BuchfinkDB, keyword, account_type, output):
         default=0.0,
         help='Hide balances smaller than this amount (default 0)'
 )
+@click.option('--refresh-assets', is_flag=True, help='Force an update of the asset database')
+@click.option('--jobs', '-j', type=int, default=1,
+        help='Number of processes used to parse account files')
 @with_buchfink_db
-def balances(buchfink_db: BuchfinkDB, keyword, minimum_balance, fetch, total,
-        exclude, external, denominate_asset):
+def balances(buchfink_db: 'BuchfinkDB', keyword, minimum_balance, fetch, total,
+        exclude, external, denominate_asset, refresh_assets, jobs):
     "Show balances across all accounts"
+    from rotkehlchen.constants import ZERO
+
+    from buchfink.datatypes import FVal
 
     assets_sum = {}  # type: Dict[Asset, FVal]
-    assets_usd_sum = {}  # type: Dict[Asset, FVal]
     liabilities_sum = {}  # type: Dict[Asset, FVal]
-    liabilities_usd_sum = {}  # type: Dict[Asset, FVal]
 
-    buchfink_db.perform_assets_updates()
+    buchfink_db.perform_assets_updates(force=refresh_assets)
 
     accounts = _get_accounts(buchfink_db, external=external, keyword=keyword,
             exclude=exclude)
 
+    if not fetch:
+        buchfink_db.preload_files(accounts, jobs, events=False, balances=True)
+
     for account in accounts:
         if keyword is not None and keyword not in account.name:
             continue
@@ -212,25 +274,27 @@ def balances(buchfink_db: BuchfinkDB, keyword, minimum_balance, fetch, total,
         if fetch:
             buchfink_db.fetch_balances(account)
 
-        sheet = buchfink_db.get_balances(account)
+        # Balances are valued below, once all amounts are known
+        sheet = buchfink_db.get_balances(account, with_prices=False)
 
         for asset, balance in sheet.assets.items():
-            amount = balance.amount
-            assets_sum[asset] = assets_sum.get(asset, FVal(0)) + amount
-            assets_usd_sum[asset] = assets_usd_sum.get(asset, FVal(0)) + balance.usd_value
+            assets_sum[asset] = assets_sum.get(asset, FVal(0)) + balance.amount
 
         for liability, balance in sheet.liabilities.items():
-            amount = balance.amount
-            liabilities_sum[liability] = liabilities_sum.get(liability, FVal(0)) + amount
-            liabilities_usd_sum[liability] = liabilities_usd_sum.get(liability, FVal(0)) \
-                    + balance.usd_value
+            liabilities_sum[liability] = liabilities_sum.get(liability, FVal(0)) + balance.amount
 
     if denominate_asset is not None:
         currency = buchfink_db.get_asset_by_symbol(denominate_asset)
     else:
         currency = buchfink_db.get_main_currency()
 
-    currency_in_usd = FVal(buchfink_db.inquirer.find_usd_price(currency))
+    usd_prices = buchfink_db.find_usd_prices(chain(assets_sum, liabilities_sum, [currency]))
+    assets_usd_sum = {asset: amount * usd_prices[asset] for asset, amount in assets_sum.items()}
+    liabilities_usd_sum = {
+        asset: amount * usd_prices[asset] for asset, amount in liabilities_sum.items()
+    }
+
+    currency_in_usd = usd_prices[currency]
     logger.debug('Denominating in %s: %s USD', currency, currency_in_usd)
     table = []
     assets = [obj[0] for obj in sorted(assets_usd_sum.items(), key=itemgetter(1), reverse=True)]
@@ -321,12 +385,20 @@ def balances(buchfink_db: BuchfinkDB, keyword, minimum_balance, fetch, total,
 @click.option('--balances', 'fetch_balances', is_flag=True, help='Fetch balances only')
 @click.option('--nfts', 'fetch_nfts', is_flag=True, help='Fetch NFT balances only')
 @click.option('--trades', 'fetch_trades', is_flag=True, help='Fetch trades only')
+@click.option('--refresh-assets', is_flag=True, help='Force an update of the asset database')
 @with_buchfink_db
-def fetch_(buchfink_db: BuchfinkDB, keyword, account_type, fetch_actions, exclude,
-        fetch_balances, fetch_trades, fetch_nfts, external):
+def fetch_(buchfink_db: 'BuchfinkDB', keyword, account_type, fetch_actions, exclude,
+        fetch_balances, fetch_trades, fetch_nfts, external, refresh_assets):
     "Fetch trades for configured accounts"
+    from web3.exceptions import CannotHandleRequest
 
-    buchfink_db.perform_assets_updates()
+    from buchfink.datatypes import HistoryEventSubType
+
+    from .classification import classify_tx
+    from .importers import zerion_csv
+    from .models import FetchConfig
+
+    buchfink_db.perform_assets_updates(force=refresh_assets)
     fetch_limited = fetch_actions or fetch_balances or fetch_trades or fetch_nfts
     error_occured = False
 
@@ -455,10 +527,7 @@ def fetch_(buchfink_db: BuchfinkDB, keyword, account_type, fetch_actions, exclud
             actions.extend(annotated)
 
             if actions:
-                with open(buchfink_db.actions_directory / (name + ".yaml"), "w") as yaml_file:
-                    yaml.dump({
-                        "actions": serialize_events(actions)
-                    }, stream=yaml_file, sort_keys=True)
+                buchfink_db.write_actions(name, actions)
 
         if fetch_trades_for_this_account:
             if os.path.exists(annotations_path):
@@ -484,20 +553,17 @@ def fetch_(buchfink_db: BuchfinkDB, keyword, account_type, fetch_actions, exclud
                 else:
                     logger.warning('Removing duplicate trade: %s', trade)
 
-            trades_path = buchfink_db.trades_directory / (name + ".yaml")
-            if trades:
-                with open(trades_path, "w") as yaml_file:
-                    yaml.dump({
-                        "trades": serialize_trades(unique_trades)
-                    }, stream=yaml_file, sort_keys=True)
-            elif os.path.exists(trades_path):
-                # If we have no trades, make sure that the according yaml does not exist
-                os.unlink(trades_path)
+            # If we have no trades, this makes sure that no trades file is left
+            buchfink_db.write_trades(name, unique_trades)
+
+        # Balances and NFTs end up in the same file, which is written once
+        balances = None  # type: Optional[BalanceSheet]
+        nfts = []  # type: List[Nfts]
 
         if fetch_balances_for_this_account:
 
             try:
-                buchfink_db.fetch_balances(account)
+                balances = buchfink_db.query_annotated_balances(account)
             except (IOError, CannotHandleRequest):
                 logger.exception('Exception during fetch_balances')
                 error_occured = True
@@ -510,20 +576,9 @@ def fetch_(buchfink_db: BuchfinkDB, keyword, account_type, fetch_actions, exclud
             except IOError:
                 logger.exception('Exception during query_nfts')
                 error_occured = True
-                continue
-
-            if nfts:
-                try:
-                    with open(buchfink_db.balances_directory / (name + ".yaml"), "r") as yaml_file:
-                        contents = yaml.load(yaml_file, Loader=yaml.SafeLoader)
-                        if contents is None:
-                            contents = {}
-                except FileNotFoundError:
-                    contents = {}
 
-                with open(buchfink_db.balances_directory / (name + ".yaml"), "w") as yaml_file:
-                    contents['nfts'] = serialize_nfts(nfts)
-                    yaml.dump(contents, stream=yaml_file, sort_keys=True)
+        if balances is not None or nfts:
+            buchfink_db.write_balances(account, balances, nfts)
 
     if error_occured:
         print("One or more errors occured")
@@ -536,11 +591,15 @@ def fetch_(buchfink_db: BuchfinkDB, keyword, account_type, fetch_actions, exclud
 @click.option('--name', '-n', type=str, required=True)
 @click.option('--from', '-f', 'from_date', type=str, required=True)
 @click.option('--to', '-t', 'to_date', type=str, required=True)
+@click.option('--refresh-assets', is_flag=True, help='Force an update of the asset database')
 @with_buchfink_db
-def run(buchfink_db: BuchfinkDB, name, from_date, to_date, external):
+def run(buchfink_db: 'BuchfinkDB', name, from_date, to_date, external, refresh_assets):
     "Run a full fetch + report cycle"
+    from .models import ReportConfig
+    from .models.account import account_from_string
+    from .report import run_report
 
-    buchfink_db.perform_assets_updates()
+    buchfink_db.perform_assets_updates(force=refresh_assets)
     buchfink_db.sync_manual_prices()
 
     if external:
@@ -561,27 +620,30 @@ def run(buchfink_db: BuchfinkDB, name, from_date, to_date, external):
 @click.option('--keyword', '-k', type=str, default=None, help='Filter by keyword in account name')
 @click.option('--asset', '-a', type=str, default=None, help='Filter by asset')
 @click.option('--fetch', '-f', is_flag=True, help='Fetch trades from sources')
+@click.option('--from', 'from_date', type=str, default=None, help='Only show trades since date')
+@click.option('--to', 'to_date', type=str, default=None, help='Only show trades until date')
+@click.option('--jobs', '-j', type=int, default=1,
+        help='Number of processes used to parse account files')
 @with_buchfink_db
-def trades_(buchfink_db: BuchfinkDB, keyword, asset, fetch):  # pylint: disable=unused-argument
+def trades_(buchfink_db: 'BuchfinkDB', keyword, asset, fetch,  # pylint: disable=unused-argument
+        from_date, to_date, jobs):
     "Show trades"
+    from buchfink.serialization import serialize_timestamp
 
-    trades: List[Tuple[Trade, Account]] = []
-    for account in buchfink_db.get_all_accounts():
-        if keyword is not None and keyword not in account.name:
-            continue
+    from_ts, to_ts = _parse_date_option(from_date), _parse_date_option(to_date)
+    the_asset = buchfink_db.get_asset_by_symbol(asset) if asset is not None else None
 
+    accounts = [account for account in buchfink_db.get_all_accounts()
+            if keyword is None or keyword in account.name]
+    buchfink_db.preload_files(accounts, jobs, from_ts=from_ts, to_ts=to_ts)
+
+    trades: List[Tuple[Trade, Account]] = []
+    for account in accounts:
         trades.extend(
                 (trade, account)
-                for trade in buchfink_db.get_local_trades_for_account(account.name)
-                )
-
-    if asset is not None:
-        the_asset = buchfink_db.get_asset_by_symbol(asset)
-        trades = [
-                trade
-                for trade in trades
-                if the_asset in (trade[0].base_asset, trade[0].quote_asset)
-                ]
+                for trade in buchfink_db.iter_local_trades_for_account(
+                    account.name, from_ts, to_ts, the_asset
+                ))
 
     trades = sorted(trades, key=lambda trade_account: trade_account[0].timestamp)
 
@@ -614,23 +676,32 @@ def trades_(buchfink_db: BuchfinkDB, keyword, asset, fetch):  # pylint: disable=
 @click.option('--keyword', '-k', type=str, default=None, help='Filter by keyword in account name')
 @click.option('--type', '-t', 'action_type', type=str, default=None, help='Filter by action type')
 @click.option('--asset', '-a', type=str, default=None, help='Filter by asset')
+@click.option('--from', 'from_date', type=str, default=None, help='Only show actions since date')
+@click.option('--to', 'to_date', type=str, default=None, help='Only show actions until date')
+@click.option('--jobs', '-j', type=int, default=1,
+        help='Number of processes used to parse account files')
 @with_buchfink_db
-def actions_(buchfink_db: BuchfinkDB, keyword, asset, action_type):
+def actions_(buchfink_db: 'BuchfinkDB', keyword, asset, action_type, from_date, to_date,
+        jobs):
     "Show actions"
+    from buchfink.datatypes import FVal
+    from buchfink.exceptions import NoPriceForGivenTimestamp
+    from buchfink.serialization import deserialize_ledger_action_type, serialize_timestamp
 
-    actions: List[Tuple[LedgerAction, Account]] = []
-    for account in buchfink_db.get_all_accounts():
-        if keyword is not None and keyword not in account.name:
-            continue
+    from_ts, to_ts = _parse_date_option(from_date), _parse_date_option(to_date)
+    the_asset = buchfink_db.get_asset_by_symbol(asset) if asset is not None else None
 
+    accounts = [account for account in buchfink_db.get_all_accounts()
+            if keyword is None or keyword in account.name]
+    buchfink_db.preload_files(accounts, jobs, from_ts=from_ts, to_ts=to_ts)
+
+    actions: List[Tuple[LedgerAction, Account]] = []
+    for account in accounts:
         actions.extend(
                 (action, account)
-                for action in buchfink_db.get_local_ledger_actions_for_account(account.name)
-                )
-
-    if asset is not None:
-        the_asset = buchfink_db.get_asset_by_symbol(asset)
-        actions = [action for action in actions if the_asset in (action[0].asset,)]
+                for action in buchfink_db.iter_local_ledger_actions_for_account(
+                    account.name, from_ts, to_ts, the_asset
+                ))
 
     if action_type is not None:
         actions = [
@@ -641,11 +712,14 @@ def actions_(buchfink_db: BuchfinkDB, keyword, asset, action_type):
 
     actions = sorted(actions, key=lambda action_account: action_account[0].timestamp)
 
-    historian = PriceHistorian()
-
     currency = buchfink_db.get_main_currency()
 
     if actions:
+        # The PriceHistorian may query the Inquirer singleton (e.g. for fiat
+        # pairs), so set up both of them like the other price-querying commands
+        buchfink_db.init_price_oracles()
+        historian = buchfink_db.historian
+
         table = []
         for (action, account) in actions:
 
@@ -685,12 +759,19 @@ def actions_(buchfink_db: BuchfinkDB, keyword, asset, action_type):
         help='Do not actually run the report but only render the template')
 @click.option('--year', type=int, default=None, help='Run adhoc-report for given year',
         multiple=True)
+@click.option('--refresh-assets', is_flag=True, help='Force an update of the asset database')
+@click.option('--jobs', '-j', type=int, default=1,
+        help='Number of processes used to parse account files')
 @with_buchfink_db
-def report_(buchfink_db: BuchfinkDB, keyword, external, report, year, render_only):
+def report_(buchfink_db: 'BuchfinkDB', keyword, external, report, year, render_only,
+        refresh_assets, jobs):
     "Generate reports for all report definition and output overview table"
+    from .models import ReportConfig
+    from .models.account import account_from_string
+    from .report import render_report, run_report
 
     if not render_only:
-        buchfink_db.perform_assets_updates()
+        buchfink_db.perform_assets_updates(force=refresh_assets)
         buchfink_db.sync_manual_prices()
 
     results = {}
@@ -715,6 +796,12 @@ def report_(buchfink_db: BuchfinkDB, keyword, external, report, year, render_onl
             if report is None or report in report_.name
         ]
 
+    if not render_only and reports:
+        # Reports read all events up to their end
+        buchfink_db.preload_files(accounts, jobs, to_ts=max(
+            cast('Timestamp', int(report_.to_dt.timestamp())) for report_ in reports
+        ))
+
     for _report in reports:
         name = str(_report.name)
         if not render_only:
@@ -734,20 +821,24 @@ def report_(buchfink_db: BuchfinkDB, keyword, external, report, year, render_onl
 
 
 @buchfink.command()
+@click.option('--refresh-assets', is_flag=True, help='Force an update of the asset database')
+@click.option('--jobs', '-j', type=int, default=1,
+        help='Number of processes used to parse account files')
 @with_buchfink_db
-def allowances(buchfink_db):
+def allowances(buchfink_db, refresh_assets, jobs):
     # pylint: disable = W
     "Show the amount of each asset that you could sell tax-free"
 
-    buchfink_db.perform_assets_updates()
+    buchfink_db.perform_assets_updates(force=refresh_assets)
     buchfink_db.sync_manual_prices()
 
     num_matched_accounts = 0
     all_trades = []
 
+    buchfink_db.preload_files(buchfink_db.get_all_accounts(), jobs)
     for account in buchfink_db.get_all_accounts():
         num_matched_accounts += 1
-        all_trades.extend(buchfink_db.get_local_trades_for_account(account.name))
+        all_trades.extend(buchfink_db.iter_local_trades_for_account(account.name))
 
     logger.info('Collected %d trades from %d exchange account(s)',
             len(all_trades), num_matched_accounts)
@@ -789,9 +880,10 @@ def allowances(buchfink_db):
 @click.option('--amount', '-n', type=float, default=1.0)
 @click.option('--timestamp', '-t', type=str, default=None)
 @click.option('--base-asset', '-b', 'base_asset_', type=str, default=None)
+@click.option('--refresh-assets', is_flag=True, help='Force an update of the asset database')
 @with_buchfink_db
-def quote(buchfink_db: BuchfinkDB, asset: Tuple[str], amount: float,
-        base_asset_: Optional[str], timestamp: Optional[str]):
+def quote(buchfink_db: 'BuchfinkDB', asset: Tuple[str], amount: float,
+        base_asset_: Optional[str], timestamp: Optional[str], refresh_assets: bool):
     """
     Show a price quote. In addition to the options flags, the following short syntax
     is also supported:
@@ -802,7 +894,10 @@ def quote(buchfink_db: BuchfinkDB, asset: Tuple[str], amount: float,
 
         buchfink quote 2.5 ETH/BTC
     """
-    buchfink_db.perform_assets_updates()
+    from buchfink.datatypes import FVal
+    from buchfink.serialization import deserialize_timestamp
+
+    buchfink_db.perform_assets_updates(force=refresh_assets)
     buchfink_db.sync_manual_prices()
 
     base_asset = buchfink_db.get_asset_by_symbol(base_asset_) \
@@ -812,7 +907,7 @@ def quote(buchfink_db: BuchfinkDB, asset: Tuple[str], amount: float,
     a_usd = buchfink_db.get_asset_by_symbol('USD')
 
     ds_timestamp = deserialize_timestamp(timestamp) if timestamp else None
-    historian = PriceHistorian()
+    historian = buchfink_db.historian
 
     for symbol in asset:
         try:
@@ -846,7 +941,7 @@ def quote(buchfink_db: BuchfinkDB, asset: Tuple[str], amount: float,
 @click.argument('asset', nargs=-1)
 @click.option('--base-asset', '-b', 'base_asset_', type=str, default=None)
 @with_buchfink_db
-def cache(buchfink_db: BuchfinkDB, asset: Tuple[str], base_asset_: Optional[str]):
+def cache(buchfink_db: 'BuchfinkDB', asset: Tuple[str], base_asset_: Optional[str]):
     """
     Build a historical price cache
     """
@@ -859,13 +954,31 @@ def cache(buchfink_db: BuchfinkDB, asset: Tuple[str], base_asset_: Optional[str]
         buchfink_db.cryptocompare.create_cache(asset_, base_asset, False)
 
 
+@buchfink.command('serve')
+@click.pass_context
+def serve(ctx):
+    """
+    Run a daemon that keeps the Buchfink DB initialized. While it is running,
+    the commands balances, quote, report and trades are forwarded to it.
+    """
+    with BuchfinkDaemon(ctx.obj['BUCHFINK_CONFIG'], buchfink) as daemon:
+        click.echo(click.style(f'Listening on {daemon.socket_path}', fg='green'))
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
 @buchfink.command('explore')
 @click.option('--external', '-e', type=str, multiple=True,
         help='Use adhoc / external account')
 @click.option('--keyword', '-k', type=str, default=None, help='Filter by keyword in account name')
 @with_buchfink_db
-def explore(buchfink_db: BuchfinkDB, keyword, external):
+def explore(buchfink_db: 'BuchfinkDB', keyword, external):
     "Show block explorer for account"
+    import webbrowser
+
+    from .models.account import account_from_string
 
     if external:
         accounts = [account_from_string(ext, buchfink_db) for ext in external]
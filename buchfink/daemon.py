@@ -0,0 +1,245 @@
+"""
+A local daemon ("buchfink serve") that keeps one initialized BuchfinkDB around
+and runs CLI commands against it. The normal CLI forwards the commands listed
+in DAEMON_COMMANDS to the daemon if it is running, so that they do not have to
+pay the startup costs (config parsing, unlocking the databases, connecting to
+Ethereum nodes, ...) on every invocation.
+
+The protocol is a single line of JSON per request and response over a unix
+socket that lives in the cache directory (.buchfink/) of the data directory.
+The response holds the stdout and stderr output of the command as well as its
+log records, which the CLI replays as if the command had run locally.
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import click
+
+if TYPE_CHECKING:
+    from buchfink.db import BuchfinkDB
+
+logger = logging.getLogger(__name__)
+
+SOCKET_NAME = 'buchfink.sock'
+
+# Commands that are forwarded to a running daemon. They mostly read the YAML
+# storage and query prices, but may also write files, e.g. `balances --fetch`
+# queries exchanges and writes balances and `report` writes reports. This is
+# safe as the daemon runs one command at a time and the files written are the
+# same as those of a local run.
+DAEMON_COMMANDS = ('balances', 'quote', 'report', 'trades')
+
+
+# Seconds the CLI waits for the response of the daemon, before it gives up and
+# runs the command locally, e.g. if the daemon hangs on an unresponsive node
+DAEMON_TIMEOUT = 600
+
+
+def get_socket_path(config_file) -> Path:
+    return Path(config_file).parent / '.buchfink' / SOCKET_NAME
+
+
+def _connect(socket_path: Path) -> Optional[socket.socket]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def forward_command(config_file, command: str, params: Dict[str, Any]) \
+        -> Optional[Tuple[str, str, int]]:
+    """
+    Runs the command in a running daemon, replays its log records and returns
+    its stdout and stderr output and exit code. Returns None if no daemon is
+    listening for the given config file or if it did not send a response, in
+    which case the command should be run locally.
+    """
+    socket_path = get_socket_path(config_file)
+    if not socket_path.exists():
+        return None
+
+    sock = _connect(socket_path)
+    if sock is None:
+        logger.debug('Found stale daemon socket at %s', socket_path)
+        return None
+
+    logger.debug('Forwarding "%s" to daemon at %s', command, socket_path)
+    sock.settimeout(DAEMON_TIMEOUT)
+    try:
+        with sock, sock.makefile('rwb') as stream:
+            stream.write(json.dumps({'command': command, 'params': params}).encode() + b'\n')
+            stream.flush()
+            response = json.loads(stream.readline())
+        output, errors, exit_code = response['output'], response['errors'], \
+            response['exit_code']
+        records = response['logs']
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        # e.g. the daemon died or hangs while running the command
+        logger.warning('No response from daemon at %s (%s), running locally', socket_path,
+                repr(exc))
+        return None
+
+    for record in records:
+        _replay_log_record(record)
+
+    return output, errors, exit_code
+
+
+def _replay_log_record(record: Dict[str, Any]) -> None:
+    'Emits a log record of the daemon, if enabled in this process'
+    record_logger = logging.getLogger(record['name'])
+    if record_logger.isEnabledFor(record['levelno']):
+        record_logger.handle(logging.makeLogRecord(record))
+
+
+class LogCaptureHandler(logging.StreamHandler):
+    """
+    Collects the log records of a command as JSON-serializable dicts and
+    also writes them to the log of the daemon.
+    """
+
+    def __init__(self, stream, formatter: Optional[logging.Formatter] = None):
+        super().__init__(stream)
+        self.setFormatter(formatter)
+        self.records = []  # type: List[Dict[str, Any]]
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        msg = record.getMessage()
+        if record.exc_info:
+            msg += '\n' + logging.Formatter().formatException(record.exc_info)
+        self.records.append({
+            'name': record.name,
+            'levelno': record.levelno,
+            'levelname': record.levelname,
+            'msg': msg,
+            'created': record.created,
+            'msecs': record.msecs,
+            'pathname': record.pathname,
+            'lineno': record.lineno,
+            'funcName': record.funcName,
+        })
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    server: 'BuchfinkDaemon'
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        output, errors, logs, exit_code = \
+            self.server.run_command(request['command'], request['params'])
+        self.wfile.write(json.dumps({
+            'output': output,
+            'errors': errors,
+            'logs': logs,
+            'exit_code': exit_code
+        }).encode() + b'\n')
+
+
+class BuchfinkDaemon(socketserver.UnixStreamServer):
+    """
+    Requests are handled one after another, as a BuchfinkDB must not be used
+    concurrently. The DB is rebuilt when the config file changes.
+    """
+
+    def __init__(self, config_file, cli: click.Group):
+        self.config_file = Path(config_file).absolute()
+        self.cli = cli
+        self.buchfink_db = None  # type: Optional[BuchfinkDB]
+        self.config_mtime = None  # type: Optional[float]
+        self.socket_path = get_socket_path(self.config_file)
+
+        if self.socket_path.exists():
+            sock = _connect(self.socket_path)
+            if sock is not None:
+                sock.close()
+                raise click.ClickException(f'Daemon is already running at {self.socket_path}')
+            self.socket_path.unlink()
+
+        # Initialize the DB before we start listening, so that the first
+        # command does not have to wait for it.
+        self.get_db()
+
+        super().__init__(str(self.socket_path), DaemonRequestHandler)
+        os.chmod(self.socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.close_db()
+
+    def close_db(self):
+        if self.buchfink_db is not None:
+            # Explicitly close connections
+            self.buchfink_db.__del__()  # pylint: disable=unnecessary-dunder-call
+            self.buchfink_db = None
+
+    def get_db(self) -> 'BuchfinkDB':
+        from buchfink.db import BuchfinkDB
+
+        config_mtime = self.config_file.stat().st_mtime
+        if self.buchfink_db is None or config_mtime != self.config_mtime:
+            if self.buchfink_db is not None:
+                logger.info('Config file has changed, reloading')
+            self.close_db()
+            self.buchfink_db = BuchfinkDB(self.config_file)
+            self.config_mtime = config_mtime
+        return self.buchfink_db
+
+    def run_command(self, command: str, params: Dict[str, Any]) \
+            -> Tuple[str, str, List[Dict[str, Any]], int]:
+        """
+        Runs a command and returns its stdout and stderr output, its log
+        records and its exit code. Log records still show up in the log of
+        the daemon as well.
+        """
+        if command not in DAEMON_COMMANDS or command not in self.cli.commands:
+            return '', f'Command can not be run by daemon: {command}\n', [], 1
+
+        logger.info('Running "%s"', command)
+        cmd = self.cli.commands[command]
+        output, errors = io.StringIO(), io.StringIO()
+        exit_code = 0
+
+        # Handlers like the one of coloredlogs look up sys.stderr for every
+        # record and would also write into `errors`. So while the command runs,
+        # the log of the daemon is written by the capture handler only.
+        root_logger = logging.getLogger()
+        root_handlers = root_logger.handlers
+        log_handler = LogCaptureHandler(
+            sys.stderr, root_handlers[0].formatter if root_handlers else None
+        )
+        root_logger.handlers = [log_handler]
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+                try:
+                    ctx = click.Context(cmd, info_name=command, color=True, obj={
+                        'BUCHFINK_CONFIG': str(self.config_file),
+                        'BUCHFINK_DB': self.get_db()
+                    })
+                    with ctx:
+                        ctx.invoke(cmd.callback, **params)
+                except click.ClickException as exc:
+                    exc.show(file=errors)
+                    exit_code = exc.exit_code
+                except SystemExit as exc:
+                    exit_code = exc.code if isinstance(exc.code, int) else 1
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception('Error while running "%s"', command)
+                    exit_code = 1
+        finally:
+            root_logger.handlers = root_handlers
+
+        return output.getvalue(), errors.getvalue(), log_handler.records, exit_code
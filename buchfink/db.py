@@ -1,60 +1,45 @@
+import importlib
 import logging
+import multiprocessing
 import operator
 import os
 import os.path
 import sys
-from datetime import datetime
-from functools import reduce
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import cached_property, reduce
+from itertools import chain
 from pathlib import Path
-from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast
+)
 
-import yaml
-from rotkehlchen.accounting.accountant import Accountant
+import rotkehlchen
 from rotkehlchen.assets.resolver import AssetResolver
-from rotkehlchen.assets.spam_assets import update_spam_assets
 from rotkehlchen.assets.types import AssetType
-from rotkehlchen.assets.utils import get_or_create_evm_token
-from rotkehlchen.chain.aggregator import ChainsAggregator
-from rotkehlchen.chain.ethereum.accountant import EthereumAccountingAggregator
-from rotkehlchen.chain.ethereum.decoding.decoder import EthereumTransactionDecoder
-from rotkehlchen.chain.ethereum.etherscan import EthereumEtherscan
-from rotkehlchen.chain.ethereum.manager import EthereumManager
-from rotkehlchen.chain.ethereum.node_inquirer import EthereumInquirer
-from rotkehlchen.chain.ethereum.oracles.saddle import SaddleOracle
-from rotkehlchen.chain.ethereum.oracles.uniswap import UniswapV2Oracle, UniswapV3Oracle
-from rotkehlchen.chain.ethereum.transactions import EthereumTransactions
-from rotkehlchen.chain.evm.accounting.aggregator import EVMAccountingAggregators
-from rotkehlchen.chain.evm.transactions import EvmTransactionsFilterQuery
 from rotkehlchen.chain.evm.types import NodeName, WeightedNode
 from rotkehlchen.constants.misc import DEFAULT_SQL_VM_INSTRUCTIONS_CB
-from rotkehlchen.data_migrations.manager import DataMigrationManager
 from rotkehlchen.data_migrations.migrations.migration_4 import read_and_write_nodes_in_database
 from rotkehlchen.db.dbhandler import DBHandler
-from rotkehlchen.db.evmtx import DBEvmTx
 from rotkehlchen.db.settings import DBSettings, db_settings_from_dict
-from rotkehlchen.exchanges.binance import Binance
-from rotkehlchen.exchanges.bitcoinde import Bitcoinde
-from rotkehlchen.exchanges.bitmex import Bitmex
-from rotkehlchen.exchanges.bittrex import Bittrex
-from rotkehlchen.exchanges.coinbase import Coinbase
-from rotkehlchen.exchanges.coinbasepro import Coinbasepro
-from rotkehlchen.exchanges.exchange import ExchangeInterface
-from rotkehlchen.exchanges.gemini import Gemini
-from rotkehlchen.exchanges.iconomi import Iconomi
-from rotkehlchen.exchanges.kraken import Kraken
-from rotkehlchen.exchanges.poloniex import Poloniex
-from rotkehlchen.externalapis.beaconchain import BeaconChain
-from rotkehlchen.externalapis.coingecko import Coingecko
-from rotkehlchen.externalapis.cryptocompare import Cryptocompare
-from rotkehlchen.externalapis.defillama import Defillama
+from rotkehlchen.errors.serialization import DeserializationError
 from rotkehlchen.globaldb.handler import GlobalDBHandler
-from rotkehlchen.globaldb.manual_price_oracles import ManualCurrentOracle
-from rotkehlchen.globaldb.updates import AssetsUpdater
 from rotkehlchen.greenlets.manager import GreenletManager
-from rotkehlchen.history.price import PriceHistorian
 from rotkehlchen.history.types import HistoricalPrice, HistoricalPriceOracle
-from rotkehlchen.inquirer import Inquirer
 from rotkehlchen.logging import TRACE, add_logging_level
+from rotkehlchen.serialization.deserialize import deserialize_evm_address
 from rotkehlchen.types import (
     SPAM_PROTOCOL,
     ChainID,
@@ -70,6 +55,19 @@ from rotkehlchen.types import (
 from rotkehlchen.user_messages import MessagesAggregator
 from rotkehlchen.utils.misc import ts_now
 
+from buchfink import timings, yaml_io
+from buchfink.cache import (
+    content_hash,
+    events_file_key,
+    load_config,
+    load_cached_events,
+    load_events,
+    load_index,
+    read_state,
+    write_events,
+    write_index,
+    write_state
+)
 from buchfink.datatypes import (
     ActionType,
     Asset,
@@ -87,25 +85,46 @@ from buchfink.datatypes import (
 from buchfink.exceptions import InputError, UnknownAsset
 from buchfink.models import (
     Account,
-    Config,
     ExchangeAccountConfig,
     HistoricalPriceConfig,
     ManualAccountConfig,
     ReportConfig
 )
-from buchfink.models.account import accounts_from_config
 from buchfink.serialization import (
+    clear_asset_caches,
+    deserialize_actions,
     deserialize_asset,
     deserialize_balance,
-    deserialize_event,
     deserialize_evm_token,
     deserialize_identifier,
-    deserialize_ledger_action,
-    deserialize_trade,
-    serialize_balances
+    deserialize_trades,
+    serialize_balances,
+    serialize_events,
+    serialize_nfts,
+    serialize_trades
 )
 
+# rotki modules that are only needed by some commands are imported where they
+# are used, so that e.g. reading the YAML storage does not have to load them.
 if TYPE_CHECKING:
+    from rotkehlchen.accounting.accountant import Accountant
+    from rotkehlchen.chain.aggregator import ChainsAggregator
+    from rotkehlchen.chain.ethereum.decoding.decoder import EthereumTransactionDecoder
+    from rotkehlchen.chain.ethereum.etherscan import EthereumEtherscan
+    from rotkehlchen.chain.ethereum.manager import EthereumManager
+    from rotkehlchen.chain.ethereum.node_inquirer import EthereumInquirer
+    from rotkehlchen.chain.ethereum.transactions import EthereumTransactions
+    from rotkehlchen.exchanges.exchange import ExchangeInterface
+    from rotkehlchen.externalapis.beaconchain import BeaconChain
+    from rotkehlchen.externalapis.coingecko import Coingecko
+    from rotkehlchen.externalapis.cryptocompare import Cryptocompare
+    from rotkehlchen.externalapis.defillama import Defillama
+    from rotkehlchen.globaldb.updates import AssetsUpdater
+    from rotkehlchen.history.price import PriceHistorian
+    from rotkehlchen.inquirer import Inquirer
+
+    from buchfink.event_store import EventStore
+
     from .datatypes import Balance  # noqa: F401
 
 logger = logging.getLogger(__name__)
@@ -113,10 +132,66 @@ logger = logging.getLogger(__name__)
 PREMIUM_ONLY_ETH_MODULES = ['adex']
 ENABLE_DATA_MIGRATION = False
 
+# Supported exchanges, mapping the name used in the config to the rotki module
+# and class implementing it. Modules are only imported once an account uses them.
+EXCHANGES = {
+    'binance': ('rotkehlchen.exchanges.binance', 'Binance'),
+    'bitcoinde': ('rotkehlchen.exchanges.bitcoinde', 'Bitcoinde'),
+    'bitmex': ('rotkehlchen.exchanges.bitmex', 'Bitmex'),
+    'bittrex': ('rotkehlchen.exchanges.bittrex', 'Bittrex'),
+    'coinbase': ('rotkehlchen.exchanges.coinbase', 'Coinbase'),
+    'coinbasepro': ('rotkehlchen.exchanges.coinbasepro', 'Coinbasepro'),
+    'gemini': ('rotkehlchen.exchanges.gemini', 'Gemini'),
+    'iconomi': ('rotkehlchen.exchanges.iconomi', 'Iconomi'),
+    'kraken': ('rotkehlchen.exchanges.kraken', 'Kraken'),
+    'poloniex': ('rotkehlchen.exchanges.poloniex', 'Poloniex'),
+}
+
+# The list of default nodes that is shipped with rotki and that gets written
+# to the DB by read_and_write_nodes_in_database()
+ROTKI_NODES_FILE = Path(rotkehlchen.__file__).parent / 'data' / 'nodes.json'
+
 if __debug__:
     add_logging_level('TRACE', TRACE)
 
 
+def year_start_ts(year: int) -> Timestamp:
+    'Returns the timestamp of January 1st (UTC) of the given year'
+    return Timestamp(int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()))
+
+
+def is_in_range(timestamp: int, from_ts: Optional[Timestamp], to_ts: Optional[Timestamp]) \
+        -> bool:
+    return (from_ts is None or timestamp >= from_ts) and (to_ts is None or timestamp <= to_ts)
+
+
+def event_assets(event: Union[Trade, LedgerAction, HistoryBaseEntry]) -> Tuple[Asset, ...]:
+    'Returns the assets an event can be filtered by'
+    if isinstance(event, Trade):
+        return (event.base_asset, event.quote_asset)
+    return (event.asset,)
+
+
+def deserialize_events_entries(kind: str, entries: List[dict]) \
+        -> List[Optional[Union[Trade, LedgerAction, HistoryBaseEntry]]]:
+    """
+    Deserializes the entries of a trades/actions file that is parsed as `kind`.
+    Entries with unknown assets are logged and returned as None, any other
+    invalid entry is an error.
+    """
+    if kind == 'trades':
+        events, errors = deserialize_trades(entries)
+    else:
+        events, errors = deserialize_actions(entries, include_trades=kind == 'actions')
+
+    for index, exc in errors:
+        if not isinstance(exc, UnknownAsset):
+            raise exc
+        logger.warning('Ignoring event with unknown asset (%s): %s', exc, entries[index])
+
+    return events
+
+
 class BuchfinkDB(DBHandler):
     """
     This class is not very thought out and might need a refactor. Currently it
@@ -128,14 +203,27 @@ class BuchfinkDB(DBHandler):
 
     def __init__(self, config_file: str = './buchfink.yaml'):
         self.config_file = Path(config_file)
+        self.data_directory = self.config_file.parent
 
-        with open(self.config_file, 'r') as cfg:
-            yaml_config = yaml.load(cfg, Loader=yaml.SafeLoader)
+        # Rotki files, these are treated as a cache from Buchfinks perspective.
+        # You should be able to delete them and have them automatically rebuild
+        # by Buchfink. Ignore them in version control.
+        self.cache_directory = self.data_directory / ".buchfink"
+        self.user_data_dir = self.cache_directory / "user"
+        self.cache_directory.mkdir(exist_ok=True)
+        self.user_data_dir.mkdir(exist_ok=True)
+        (self.cache_directory / 'cryptocompare').mkdir(exist_ok=True)
+        (self.cache_directory / 'history').mkdir(exist_ok=True)
+        (self.cache_directory / 'inquirer').mkdir(exist_ok=True)
+        (self.cache_directory / 'coingecko').mkdir(exist_ok=True)
 
-        self.data_directory = self.config_file.parent
-        self.config = Config(**yaml_config)
-        self.accounts = accounts_from_config(self.config)  # type: List[Account]
+        with timings.phase('db.load_config'):
+            self.config, self.accounts = load_config(self.config_file, self.cache_directory)
         self._active_eth_address = None  # type: Optional[ChecksumEvmAddress]
+        self._exchanges = {}  # type: Dict[str, ExchangeInterface]
+        # YAML documents parsed ahead of time by preload_files(), by path,
+        # together with the number of reads that are still expected
+        self._preloaded = {}  # type: Dict[str, Tuple[Any, int]]
 
         # Buchfink directories, these include the YAML storage and the reports
         # etc. Basically these are the ones you want version-controlled.
@@ -150,63 +238,37 @@ class BuchfinkDB(DBHandler):
         self.balances_directory.mkdir(exist_ok=True)
         self.annotations_directory.mkdir(exist_ok=True)
 
-        # Rotki files, these are treated as a cache from Buchfinks perspective.
-        # You should be able to delete them and have them automatically rebuild
-        # by Buchfink. Ignore them in version control.
-        self.cache_directory = self.data_directory / ".buchfink"
-        self.user_data_dir = self.cache_directory / "user"
-        self.cache_directory.mkdir(exist_ok=True)
-        self.user_data_dir.mkdir(exist_ok=True)
-        (self.cache_directory / 'cryptocompare').mkdir(exist_ok=True)
-        (self.cache_directory / 'history').mkdir(exist_ok=True)
-        (self.cache_directory / 'inquirer').mkdir(exist_ok=True)
-        (self.cache_directory / 'coingecko').mkdir(exist_ok=True)
-
         self.last_write_ts: Optional[Timestamp] = None
 
         # self._amm_swaps = []  # type: List[AMMSwap]
         self.msg_aggregator = MessagesAggregator()
-        self.cryptocompare = Cryptocompare(self.cache_directory / 'cryptocompare', self)
-        self.coingecko = Coingecko()
-        self.defillama = Defillama()
-        self.historian = PriceHistorian(
-                self.cache_directory / 'history',
-                self.cryptocompare,
-                self.coingecko,
-                self.defillama
-            )
-
         self.greenlet_manager = GreenletManager(msg_aggregator=self.msg_aggregator)
 
-        # Initialize blockchain querying modules
-        self.etherscan = EthereumEtherscan(database=self, msg_aggregator=self.msg_aggregator)
+        # The global DB has to be opened eagerly. The user DB below syncs its
+        # assets into it during construction and the (de)serialization helpers
+        # resolve assets through the GlobalDBHandler singleton.
         GlobalDBHandler._GlobalDBHandler__instance = None
-        self.globaldb = GlobalDBHandler(
-            data_dir=self.cache_directory,
-            sql_vm_instructions_cb=DEFAULT_SQL_VM_INSTRUCTIONS_CB
-        )
-        self.asset_resolver = AssetResolver()
-        self.assets_updater = AssetsUpdater(self.msg_aggregator)
-
-        self.inquirer = Inquirer(
-                data_dir=self.cache_directory / 'inquirer',
-                cryptocompare=self.cryptocompare,
-                coingecko=self.coingecko,
-                manualcurrent=ManualCurrentOracle(),
-                msg_aggregator=self.msg_aggregator,
-                defillama=self.defillama
+        with timings.phase('db.open_globaldb'):
+            self.globaldb = GlobalDBHandler(
+                data_dir=self.cache_directory,
+                sql_vm_instructions_cb=DEFAULT_SQL_VM_INSTRUCTIONS_CB
             )
+        self.asset_resolver = AssetResolver()
+        clear_asset_caches()
 
         # After calling the parent constructor, we will have a db connection.
-        super().__init__(
-                self.user_data_dir,
-                'password',
-                self.msg_aggregator,
-                None,
-                sql_vm_instructions_cb=DEFAULT_SQL_VM_INSTRUCTIONS_CB
-        )
+        with timings.phase('db.open_userdb'):
+            super().__init__(
+                    self.user_data_dir,
+                    'password',
+                    self.msg_aggregator,
+                    None,
+                    sql_vm_instructions_cb=DEFAULT_SQL_VM_INSTRUCTIONS_CB
+            )
 
         if ENABLE_DATA_MIGRATION:
+            from rotkehlchen.data_migrations.manager import DataMigrationManager
+
             class FakeRotki():
                 class FakeData():
                     db = self
@@ -217,42 +279,134 @@ class BuchfinkDB(DBHandler):
             self.migration_manager.maybe_migrate_data()
 
         self.sync_rpc_nodes()
-        ethereum_nodes = self.get_rpc_nodes(SupportedBlockchain.ETHEREUM, only_active=True)
 
-        self.ethereum_inquirer = EthereumInquirer(
+        # Everything else (price oracles, Ethereum node connections, the tx
+        # decoder, ...) is constructed on first access, see the properties below.
+
+    @cached_property
+    def cryptocompare(self) -> 'Cryptocompare':
+        from rotkehlchen.externalapis.cryptocompare import Cryptocompare
+
+        return Cryptocompare(self.cache_directory / 'cryptocompare', self)
+
+    @cached_property
+    def coingecko(self) -> 'Coingecko':
+        from rotkehlchen.externalapis.coingecko import Coingecko
+
+        return Coingecko()
+
+    @cached_property
+    def defillama(self) -> 'Defillama':
+        from rotkehlchen.externalapis.defillama import Defillama
+
+        return Defillama()
+
+    @cached_property
+    @timings.phase('db.historian')
+    def historian(self) -> 'PriceHistorian':
+        from rotkehlchen.history.price import PriceHistorian
+
+        historian = PriceHistorian(
+                self.cache_directory / 'history',
+                self.cryptocompare,
+                self.coingecko,
+                self.defillama
+            )
+        historian.set_oracles_order(self.get_settings().historical_price_oracles)
+        return historian
+
+    @cached_property
+    @timings.phase('db.inquirer')
+    def inquirer(self) -> 'Inquirer':
+        from rotkehlchen.chain.ethereum.oracles.saddle import SaddleOracle
+        from rotkehlchen.chain.ethereum.oracles.uniswap import UniswapV2Oracle, UniswapV3Oracle
+        from rotkehlchen.globaldb.manual_price_oracles import ManualCurrentOracle
+        from rotkehlchen.inquirer import Inquirer
+
+        inquirer = Inquirer(
+                data_dir=self.cache_directory / 'inquirer',
+                cryptocompare=self.cryptocompare,
+                coingecko=self.coingecko,
+                manualcurrent=ManualCurrentOracle(),
+                msg_aggregator=self.msg_aggregator,
+                defillama=self.defillama
+            )
+        inquirer.inject_evm_managers([(ChainID.ETHEREUM, self.ethereum_manager)])
+        inquirer.add_defi_oracles(
+            uniswap_v2=UniswapV2Oracle(self.ethereum_inquirer),
+            uniswap_v3=UniswapV3Oracle(self.ethereum_inquirer),
+            saddle=SaddleOracle(self.ethereum_inquirer),
+        )
+        inquirer.set_oracles_order(self.get_settings().current_price_oracles)
+        return inquirer
+
+    @cached_property
+    def assets_updater(self) -> 'AssetsUpdater':
+        from rotkehlchen.globaldb.updates import AssetsUpdater
+
+        return AssetsUpdater(self.msg_aggregator)
+
+    @cached_property
+    def etherscan(self) -> 'EthereumEtherscan':
+        from rotkehlchen.chain.ethereum.etherscan import EthereumEtherscan
+
+        return EthereumEtherscan(database=self, msg_aggregator=self.msg_aggregator)
+
+    @cached_property
+    @timings.phase('db.connect_rpc_nodes')
+    def ethereum_inquirer(self) -> 'EthereumInquirer':
+        from rotkehlchen.chain.ethereum.node_inquirer import EthereumInquirer
+
+        return EthereumInquirer(
             greenlet_manager=self.greenlet_manager,
-            connect_at_start=ethereum_nodes,
+            connect_at_start=self.get_rpc_nodes(SupportedBlockchain.ETHEREUM, only_active=True),
             database=self
         )
 
-        self.ethereum_manager = EthereumManager(self.ethereum_inquirer)
-        self.eth_transactions = EthereumTransactions(
-                ethereum_inquirer=self.ethereum_inquirer, database=self
-        )
-        self.evm_tx_decoder = EthereumTransactionDecoder(
+    @cached_property
+    def ethereum_manager(self) -> 'EthereumManager':
+        from rotkehlchen.chain.ethereum.manager import EthereumManager
+
+        return EthereumManager(self.ethereum_inquirer)
+
+    @cached_property
+    def eth_transactions(self) -> 'EthereumTransactions':
+        from rotkehlchen.chain.ethereum.transactions import EthereumTransactions
+
+        return EthereumTransactions(ethereum_inquirer=self.ethereum_inquirer, database=self)
+
+    @cached_property
+    @timings.phase('db.evm_tx_decoder')
+    def evm_tx_decoder(self) -> 'EthereumTransactionDecoder':
+        from rotkehlchen.chain.ethereum.decoding.decoder import EthereumTransactionDecoder
+
+        self.init_price_oracles()
+        return EthereumTransactionDecoder(
             database=self,
             ethereum_inquirer=self.ethereum_inquirer,
             transactions=self.eth_transactions,
             # msg_aggregator=self.msg_aggregator,
         )
 
-        # if rpc_nodes:
-        #     self.ethereum_manager.connect_to_multiple_nodes(rpc_nodes)
-
-        self.inquirer.inject_evm_managers([(ChainID.ETHEREUM, self.ethereum_manager)])
-        uniswap_v2_oracle = UniswapV2Oracle(self.ethereum_inquirer)
-        uniswap_v3_oracle = UniswapV3Oracle(self.ethereum_inquirer)
-        saddle_oracle = SaddleOracle(self.ethereum_inquirer)
-        Inquirer().add_defi_oracles(
-            uniswap_v2=uniswap_v2_oracle,
-            uniswap_v3=uniswap_v3_oracle,
-            saddle=saddle_oracle,
-        )
-        self.inquirer.set_oracles_order(self.get_settings().current_price_oracles)
-        self.historian.set_oracles_order(self.get_settings().historical_price_oracles)
-        self.beaconchain = BeaconChain(database=self, msg_aggregator=self.msg_aggregator)
+    @cached_property
+    def beaconchain(self) -> 'BeaconChain':
+        from rotkehlchen.externalapis.beaconchain import BeaconChain
+
+        return BeaconChain(database=self, msg_aggregator=self.msg_aggregator)
+
+    def init_price_oracles(self) -> None:
+        """
+        Rotki queries prices through the Inquirer and PriceHistorian singletons
+        in many places. Call this before handing control to such rotki code.
+        """
+        _ = self.inquirer, self.historian
 
     def __del__(self) -> None:
+        # Only close the event store if it was opened, and only once
+        event_store = vars(self).pop('event_store', None)
+        if event_store is not None:
+            event_store.close()
+
         try:
             super().__del__()
         except NameError:
@@ -294,6 +448,9 @@ class BuchfinkDB(DBHandler):
         clean_settings.pop('external_services', None)
         clean_settings.pop('rpc_nodes', None)
         clean_settings.pop('ignored_assets', None)
+        clean_settings.pop('assets_update_ttl', None)
+        clean_settings.pop('partition_by_year', None)
+        clean_settings.pop('event_store', None)
 
         # Remove None values
         for k in list(clean_settings):
@@ -327,6 +484,8 @@ class BuchfinkDB(DBHandler):
 
     def get_eth_transactions(self, account: Account, with_receipts: bool = False) \
             -> List[Tuple[EvmTransaction, Optional[EvmTxReceipt]]]:
+        from rotkehlchen.chain.evm.transactions import EvmTransactionsFilterQuery
+        from rotkehlchen.db.evmtx import DBEvmTx
 
         assert account.account_type == "ethereum"
         address = cast(ChecksumEvmAddress, account.address)
@@ -378,7 +537,13 @@ class BuchfinkDB(DBHandler):
 
         return ExternalServiceApiCredentials(service=service_name, api_key=api_key)
 
-    def get_accountant(self) -> Accountant:
+    @timings.phase('db.get_accountant')
+    def get_accountant(self) -> 'Accountant':
+        from rotkehlchen.accounting.accountant import Accountant
+        from rotkehlchen.chain.ethereum.accountant import EthereumAccountingAggregator
+        from rotkehlchen.chain.evm.accounting.aggregator import EVMAccountingAggregators
+
+        self.init_price_oracles()
 
         ethereum_accounting_aggregator = EthereumAccountingAggregator(
             node_inquirer=self.ethereum_inquirer,
@@ -402,97 +567,362 @@ class BuchfinkDB(DBHandler):
             return BlockchainAccounts(eth=self._active_eth_address)
         return BlockchainAccounts()
 
+    def get_events_fingerprint(self) -> str:
+        """
+        Deserialized events depend on the asset database, so cached events are
+        invalidated when the config tokens change or an asset update changed the
+        asset database (see get_assets_version).
+        """
+        tokens_state = read_state(self.cache_directory / 'tokens.json') or {}
+        return content_hash(tokens_state.get('fingerprint'), self.get_assets_version())
+
+    def get_assets_version(self) -> Optional[str]:
+        'Returns the version of the global DB recorded by the last asset update'
+        assets_state = read_state(self.cache_directory / 'assets_update.json') or {}
+        return assets_state.get('assets_version')
+
+    def query_assets_version(self) -> str:
+        """
+        Returns a hash of the assets version of the global DB, which rotki bumps
+        when an update adds or edits assets, and of the number of assets, which
+        also covers e.g. spam tokens added outside of those updates.
+        """
+        with self.globaldb.conn.read_ctx() as cursor:
+            cursor.execute("SELECT value FROM settings WHERE name='assets_version'")
+            version = cursor.fetchone()
+            cursor.execute('SELECT COUNT(*) FROM assets')
+            num_assets = cursor.fetchone()[0]
+        return content_hash(version[0] if version is not None else None, num_assets)
+
+    def load_yaml_file(self, path) -> Any:
+        'Returns the contents of a YAML file, preferring a copy from preload_files()'
+        key = str(Path(path).absolute())
+        if key in self._preloaded:
+            document, reads = self._preloaded.pop(key)
+            if reads > 1:
+                self._preloaded[key] = (document, reads - 1)
+            return document
+        return yaml_io.load_file(path)
+
+    def clear_preloaded(self) -> None:
+        'Drops the documents of preload_files() that have not been read'
+        if self._preloaded:
+            logger.debug('Dropping %d preloaded file(s)', len(self._preloaded))
+        self._preloaded.clear()
+
+    def preload_files(self, accounts: List[Account], jobs: int, events: bool = True,
+            balances: bool = False, from_ts: Optional[Timestamp] = None,
+            to_ts: Optional[Timestamp] = None) -> None:
+        """
+        Parses the YAML files of the given accounts in a pool of `jobs`
+        processes, so that the subsequent reads do not have to parse them
+        one after another. Only files whose events are not cached yet and
+        that hold events within the given time range are parsed. The workers
+        only run the YAML parser and return plain documents; these are
+        deserialized into rotki objects by this process, which holds the
+        asset database. Documents that were not read by the end of the
+        command are dropped with clear_preloaded().
+        """
+        if jobs <= 1:
+            return
+
+        paths = []  # type: List[str]
+        if events:
+            fingerprint = self.get_events_fingerprint()
+            for account in accounts:
+                for group in ('trades', 'actions'):
+                    kind, events_files = self.get_event_files(account, group, from_ts, to_ts)
+                    for events_file in events_files:
+                        if not events_file.exists():
+                            continue
+                        if self.needs_parsing(account, kind, events_file, fingerprint):
+                            paths.append(str(events_file.absolute()))
+        if balances:
+            for account in accounts:
+                balances_file = self.balances_directory / (account.name + '.yaml')
+                if balances_file.exists():
+                    paths.append(str(balances_file.absolute()))
+
+        if not paths:
+            return
+
+        reads = Counter(paths)
+        unique_paths = list(reads)
+        logger.debug('Preloading %d files with %d jobs', len(unique_paths), jobs)
+
+        with timings.phase('db.preload_files'):
+            # Spawned workers do not inherit the state of rotki (e.g. its
+            # greenlets), they only import the YAML module
+            with ProcessPoolExecutor(max_workers=jobs,
+                    mp_context=multiprocessing.get_context('spawn')) as pool:
+                documents = pool.map(yaml_io.load_file, unique_paths,
+                        chunksize=max(1, len(unique_paths) // (jobs * 4)))
+                for path, document in zip(unique_paths, documents):
+                    self._preloaded[path] = (document, reads[path])
+
+    def needs_parsing(self, account: Account, kind: str, events_file: Path,
+            fingerprint: str) -> bool:
+        'Returns whether reading the events of a file will have to parse it'
+        if self.config.settings.event_store:
+            synced_keys = self.event_store.get_file_keys(account.name, kind)
+            return synced_keys.get(str(events_file.absolute())) != \
+                content_hash(events_file_key(events_file, kind, fingerprint))
+        # The index is written along with the events cache, and is cheap to load
+        return load_index(self.cache_directory, events_file, kind, fingerprint) is None
+
+    @timings.phase('db.load_trades')
     def get_trades_from_file(self, trades_file) -> List[Trade]:
-        def safe_deserialize_trade(trade):
-            try:
-                return deserialize_trade(trade)
-            except UnknownAsset:
-                logger.warning('Ignoring trade with unknown asset: %s', trade)
-                return None
-
-        with open(trades_file, 'r') as trades_f:
-            exchange = yaml.load(trades_f, Loader=yaml.SafeLoader)
-
-        return [ser_trade
-                for ser_trade in [
-                    safe_deserialize_trade(trade) for trade in exchange.get('trades', [])]
-                if ser_trade is not None] \
-                + [ser_trade
-                for ser_trade in [
-                    safe_deserialize_trade(trade) for trade in exchange.get('actions', [])
-                    if 'buy' in trade or 'sell' in trade]
-                if ser_trade is not None]
-
-    def get_local_trades_for_account(self, account_name: Union[str, Account]) -> List[Trade]:
-        if isinstance(account_name, str):
-            account = [a for a in self.accounts if a.name == account_name][0]  # type: Account
-        else:
-            account = account_name
-
-        if account.account_type == 'file':
-            if not isinstance(account.config, ManualAccountConfig):
-                # TODO: this check should already be enforced by type system
-                raise ValueError("Invalid account config")
-
-            trades_file = os.path.join(self.data_directory, account.config.file)
-            return self.get_trades_from_file(trades_file)
+        return load_events(
+            self.cache_directory,
+            trades_file,
+            'trades',
+            self.get_events_fingerprint(),
+            lambda: self.parse_trades_file(trades_file)
+        )
 
-        trades_file = os.path.join(self.data_directory, 'trades', account.name + '.yaml')
+    def read_trade_entries(self, trades_file) -> List[dict]:
+        'Returns the serialized trades of a file, including trades in its actions'
+        exchange = self.load_yaml_file(trades_file)
 
-        if os.path.exists(trades_file):
-            return self.get_trades_from_file(trades_file)
+        return list(chain(
+            exchange.get('trades', []),
+            (action for action in exchange.get('actions', [])
+                if 'buy' in action or 'sell' in action)
+        ))
 
-        return []
+    def parse_trades_file(self, trades_file) -> List[Trade]:
+        trades = deserialize_events_entries('trades', self.read_trade_entries(trades_file))
+        return self._index_events_file(trades_file, 'trades', list(enumerate(trades)))
 
+    @timings.phase('db.load_actions')
     def get_actions_from_file(self, actions_file, include_trades=True) \
             -> List[Union[LedgerAction, HistoryBaseEntry]]:
-        def safe_deserialize_ledger_action(action):
-            if 'buy' in action or 'sell' in action:  # it is a Trade or AMMSwap
-                if not include_trades:
-                    return None
-                return deserialize_trade(action)
-            if 'spend_fee' in action:  # it is a HistoryBaseEntry
-                return deserialize_event(action)
-            try:
-                return deserialize_ledger_action(action)
-            except UnknownAsset:
-                logger.warning('Ignoring ledger action with unknown asset: %s', action)
-                return None
+        return load_events(
+            self.cache_directory,
+            actions_file,
+            'actions' if include_trades else 'actions_without_trades',
+            self.get_events_fingerprint(),
+            lambda: self.parse_actions_file(actions_file, include_trades)
+        )
 
-        with open(actions_file, 'r') as actions_f:
-            exchange = yaml.load(actions_f, Loader=yaml.SafeLoader)
+    def read_action_entries(self, actions_file) -> List[dict]:
+        'Returns the serialized actions of a file'
+        exchange = self.load_yaml_file(actions_file)
 
-        return [ser_action
-                for ser_action in [
-                    safe_deserialize_ledger_action(action)
-                    for action in exchange.get('actions', [])
-                ]
-                if ser_action is not None]
+        return exchange.get('actions', [])
 
-    def get_local_ledger_actions_for_account(self, account_name: Union[str, Account]) \
+    def parse_actions_file(self, actions_file, include_trades=True) \
             -> List[Union[LedgerAction, HistoryBaseEntry]]:
-        if isinstance(account_name, str):
-            account = [a for a in self.accounts if a.name == account_name][0]  # type: Account
-        else:
-            account = account_name
-
+        kind = 'actions' if include_trades else 'actions_without_trades'
+        actions = deserialize_events_entries(kind, self.read_action_entries(actions_file))
+        return self._index_events_file(actions_file, kind, list(enumerate(actions)))
+
+    def _index_events_file(self, events_file, kind: str, events: list) -> list:
+        """
+        Writes the index of a trades/actions file from its deserialized events
+        and the offsets of their entries in the file, and returns the events.
+        """
+        assets = {}  # type: Dict[str, List[int]]
+        timestamps = []
+        for offset, event in events:
+            if event is None:
+                continue
+            timestamps.append(event.get_timestamp())
+            for asset in event_assets(event):
+                offsets = assets.setdefault(asset.identifier, [])
+                if not offsets or offsets[-1] != offset:
+                    offsets.append(offset)
+
+        write_index(self.cache_directory, events_file, kind, self.get_events_fingerprint(), {
+            'min_ts': min(timestamps, default=None),
+            'max_ts': max(timestamps, default=None),
+            'assets': assets
+        })
+        return [event for _, event in events if event is not None]
+
+    def read_events_entries(self, events_file, kind: str) -> List[dict]:
+        if kind == 'trades':
+            return self.read_trade_entries(events_file)
+        return self.read_action_entries(events_file)
+
+    def query_events_file(self, events_file, kind: str, asset: Optional[Asset] = None,
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None) -> list:
+        """
+        Returns the events of a trades/actions file that involve the given asset
+        and lie within the given time range. The index of the file is used to
+        skip files that cannot match and, if filtering by asset, to only
+        deserialize the entries of that asset.
+        """
+        def matches(event) -> bool:
+            return is_in_range(event.get_timestamp(), from_ts, to_ts) and \
+                (asset is None or asset in event_assets(event))
+
+        fingerprint = self.get_events_fingerprint()
+        index = load_index(self.cache_directory, events_file, kind, fingerprint)
+        if index is not None:
+            if index['min_ts'] is None or \
+                    (from_ts is not None and index['max_ts'] < from_ts) or \
+                    (to_ts is not None and index['min_ts'] > to_ts):
+                return []
+
+        if index is None or asset is None:
+            # Without an index the file is parsed through the events cache,
+            # which writes both the cache and the index for the next query
+            if kind == 'trades':
+                events = self.get_trades_from_file(events_file)
+            else:
+                events = self.get_actions_from_file(events_file, kind == 'actions')
+            return [event for event in events if matches(event)]
+
+        offsets = index['assets'].get(asset.identifier)
+        if not offsets:
+            return []
+
+        # Unpickling the cached events is much cheaper than parsing the YAML
+        # file again, so only the entries of the asset are parsed without them
+        events = load_cached_events(self.cache_directory, events_file, kind, fingerprint)
+        if events is not None:
+            return [event for event in events if matches(event)]
+
+        entries = self.read_events_entries(events_file, kind)
+        events = deserialize_events_entries(kind, [entries[offset] for offset in offsets])
+        return [event for event in events if event is not None and matches(event)]
+
+    def get_event_files(self, account: Account, group: str,
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None) \
+            -> Tuple[str, List[Path]]:
+        """
+        Returns how the files holding the trades or actions (`group`) of an
+        account are parsed (see `get_actions_from_file`) and the files
+        themselves, skipping partitions outside of the given time range.
+        """
         if account.account_type == 'file':
             if not isinstance(account.config, ManualAccountConfig):
                 # TODO: this check should already be enforced by type system
                 raise ValueError("Invalid account config")
 
-            actions_file = self.data_directory / account.config.file
-            if actions_file.exists():
-                return self.get_actions_from_file(actions_file, include_trades=False)
+            events_file = self.data_directory / account.config.file
+            if group == 'trades':
+                return 'trades', [events_file]
+            return 'actions_without_trades', [events_file] if events_file.exists() else []
 
+        directory = self.trades_directory if group == 'trades' else self.actions_directory
+        return group, list(self.iter_event_files(directory, account.name, from_ts, to_ts))
+
+    def iter_account_events(self, account_name: Union[str, Account], group: str,
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None,
+            asset: Optional[Asset] = None) -> Iterator:
+        if isinstance(account_name, str):
+            account = [a for a in self.accounts if a.name == account_name][0]  # type: Account
         else:
-            actions_file = self.data_directory / f'actions/{account.name}.yaml'
-            if actions_file.exists():
-                return self.get_actions_from_file(actions_file)
+            account = account_name
 
-        return []
+        if self.config.settings.event_store:
+            yield from self.query_event_store(account, group, asset, from_ts, to_ts)
+            return
+
+        kind, events_files = self.get_event_files(account, group, from_ts, to_ts)
+        for events_file in events_files:
+            if from_ts is not None or to_ts is not None or asset is not None:
+                yield from self.query_events_file(events_file, kind, asset, from_ts, to_ts)
+            elif kind == 'trades':
+                yield from self.get_trades_from_file(events_file)
+            else:
+                yield from self.get_actions_from_file(events_file, kind == 'actions')
+
+    def get_local_trades_for_account(self, account_name: Union[str, Account],
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None,
+            asset: Optional[Asset] = None) -> List[Trade]:
+        return list(self.iter_local_trades_for_account(account_name, from_ts, to_ts, asset))
+
+    def iter_local_trades_for_account(self, account_name: Union[str, Account],
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None,
+            asset: Optional[Asset] = None) -> Iterator[Trade]:
+        """
+        Yields the trades of an account, optionally limited to a time range
+        and to trades of the given asset. Only the events of the file that is
+        currently read are held in memory.
+        """
+        return self.iter_account_events(account_name, 'trades', from_ts, to_ts, asset)
+
+    def get_local_ledger_actions_for_account(self, account_name: Union[str, Account],
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None,
+            asset: Optional[Asset] = None) -> List[Union[LedgerAction, HistoryBaseEntry]]:
+        return list(self.iter_local_ledger_actions_for_account(
+            account_name, from_ts, to_ts, asset
+        ))
+
+    def iter_local_ledger_actions_for_account(self, account_name: Union[str, Account],
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None,
+            asset: Optional[Asset] = None) -> Iterator[Union[LedgerAction, HistoryBaseEntry]]:
+        """
+        Yields the ledger actions and events of an account, optionally limited
+        to a time range and to events of the given asset. Only the events of
+        the file that is currently read are held in memory.
+        """
+        return self.iter_account_events(account_name, 'actions', from_ts, to_ts, asset)
+
+    @cached_property
+    def event_store(self) -> 'EventStore':
+        from buchfink.event_store import EventStore
+
+        return EventStore(self.cache_directory / 'events.sqlite')
+
+    @timings.phase('db.sync_event_store')
+    def sync_event_store(self, account: Account, group: str) -> str:
+        """
+        Brings the event store up to date with the trades or actions files of
+        an account, re-reading only files that changed since the last sync.
+        Returns the kind under which the events are stored.
+        """
+        kind, events_files = self.get_event_files(account, group)
+        fingerprint = self.get_events_fingerprint()
+        synced_keys = self.event_store.get_file_keys(account.name, kind)
+
+        for events_file in events_files:
+            path = str(events_file.absolute())
+            key = content_hash(events_file_key(events_file, kind, fingerprint))
+            if synced_keys.pop(path, None) == key:
+                continue
+
+            logger.debug('Syncing %s to the event store', events_file)
+            entries = self.read_events_entries(events_file, kind)
+            rows = [
+                (
+                    offset,
+                    event.get_timestamp(),
+                    entry,
+                    [asset.identifier for asset in event_assets(event)]
+                )
+                for offset, (entry, event)
+                in enumerate(zip(entries, deserialize_events_entries(kind, entries)))
+                if event is not None
+            ]
+            self.event_store.replace_file(account.name, kind, path, key, rows)
+
+        # Files that no longer exist, e.g. removed partitions
+        for path in synced_keys:
+            self.event_store.remove_file(path, kind)
+
+        return kind
+
+    def query_event_store(self, account: Account, group: str, asset: Optional[Asset] = None,
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None) -> list:
+        'Returns the trades or actions of an account from the event store'
+        kind = self.sync_event_store(account, group)
+        entries = self.event_store.query(
+            account.name,
+            kind,
+            asset.identifier if asset is not None else None,
+            from_ts,
+            to_ts
+        )
+        events = deserialize_events_entries(kind, entries)
+        return [event for event in events if event is not None]
+
+    def get_chains_aggregator(self, account: Account) -> 'ChainsAggregator':
+        from rotkehlchen.chain.aggregator import ChainsAggregator
 
-    def get_chains_aggregator(self, account: Account) -> ChainsAggregator:
         accs = {}  # type: ignore
 
         if account.account_type == "ethereum":
@@ -505,6 +935,7 @@ class BuchfinkDB(DBHandler):
             raise ValueError('Unable to create chain manager for account')
 
         self.sync_accounts([account])
+        self.init_price_oracles()
 
         # Eventually we should allow premium credentials in config file
         premium = False
@@ -535,7 +966,9 @@ class BuchfinkDB(DBHandler):
         manager.queried_addresses_for_module = lambda self, module = None: [account.address]
         return manager
 
-    def get_exchange(self, account: str) -> ExchangeInterface:
+    def get_exchange(self, account: str) -> 'ExchangeInterface':
+        if account in self._exchanges:
+            return self._exchanges[account]
 
         account_ = [a for a in self.accounts if a.name == account][0]
         account_config = account_.config
@@ -543,6 +976,14 @@ class BuchfinkDB(DBHandler):
         if not isinstance(account_config, ExchangeAccountConfig):
             raise ValueError("Not an exchange account: " + account)
 
+        if account_config.exchange not in EXCHANGES:
+            raise ValueError("Unknown exchange: " + account_config.exchange)
+
+        self.init_price_oracles()
+
+        module_name, class_name = EXCHANGES[account_config.exchange]
+        exchange_class = getattr(importlib.import_module(module_name), class_name)
+
         exchange_opts = {
             'name': account_config.name,
             'api_key': str(account_config.api_key),
@@ -551,29 +992,11 @@ class BuchfinkDB(DBHandler):
             'msg_aggregator': self.msg_aggregator
         }
 
-        if account_config.exchange == 'kraken':
-            exchange = Kraken(**exchange_opts)
-        elif account_config.exchange == 'binance':
-            exchange = Binance(**exchange_opts)
-        elif account_config.exchange == 'coinbase':
-            exchange = Coinbase(**exchange_opts)
-        elif account_config.exchange == 'coinbasepro':
-            exchange = Coinbasepro(**exchange_opts, passphrase=str(account_config.passphrase))
-        elif account_config.exchange == 'gemini':
-            exchange = Gemini(**exchange_opts)
-        elif account_config.exchange == 'bitmex':
-            exchange = Bitmex(**exchange_opts)
-        elif account_config.exchange == 'bittrex':
-            exchange = Bittrex(**exchange_opts)
-        elif account_config.exchange == 'poloniex':
-            exchange = Poloniex(**exchange_opts)
-        elif account_config.exchange == 'bitcoinde':
-            exchange = Bitcoinde(**exchange_opts)
-        elif account_config.exchange == 'iconomi':
-            exchange = Iconomi(**exchange_opts)
-        else:
-            raise ValueError("Unknown exchange: " + account_config.exchange)
+        if account_config.exchange == 'coinbasepro':
+            exchange_opts['passphrase'] = str(account_config.passphrase)
 
+        exchange = exchange_class(**exchange_opts)
+        self._exchanges[account] = exchange
         return exchange
 
     def query_balances(self, account) -> BalanceSheet:
@@ -657,22 +1080,42 @@ class BuchfinkDB(DBHandler):
         return []
 
     def fetch_balances(self, account: Account):
+        self.write_balances(account, self.query_annotated_balances(account))
+
+    def query_annotated_balances(self, account: Account) -> BalanceSheet:
+        'Queries the balances of an account and adds its annotations to them'
         query_sheet = self.query_balances(account)
         logger.debug('Balances for %s before annotations: %s', account.name, query_sheet)
         path = self.annotations_directory / (account.name + '.yaml')
         if path.exists():
-            query_sheet += self.get_balances_from_file(path)
-        self.write_balances(account, query_sheet)
+            # Only the amounts end up in the balances file, so there is no
+            # need to price the annotations
+            query_sheet += self.get_balances_from_file(path, with_prices=False)
+        return query_sheet
 
-    def get_balances(self, account: Account) -> BalanceSheet:
+    def get_balances(self, account: Account, with_prices=True) -> BalanceSheet:
         path = self.balances_directory / (account.name + '.yaml')
         if path.exists():
-            return self.get_balances_from_file(path)
+            return self.get_balances_from_file(path, with_prices)
         return BalanceSheet(assets={}, liabilities={})
 
-    def get_balances_from_file(self, path) -> BalanceSheet:
-        with open(path, 'r') as account_f:
-            account = yaml.load(account_f, Loader=yaml.SafeLoader)
+    @timings.phase('db.find_usd_prices')
+    def find_usd_prices(self, assets: Iterable[Asset]) -> Dict[Asset, FVal]:
+        """
+        Returns the current USD price of each of the given assets, querying the
+        price oracles only once per distinct asset.
+
+        The prices are resolved one after the other: the Inquirer and its
+        oracles share caches and HTTP sessions that are not safe to use from
+        several threads.
+        """
+        return {
+            asset: FVal(self.inquirer.find_usd_price(asset))
+            for asset in set(assets)
+        }
+
+    def get_balances_from_file(self, path, with_prices=True) -> BalanceSheet:
+        account = self.load_yaml_file(path)
 
         assets = {}  # type: Dict[Asset, Balance]
         liabilities = {}  # type: Dict[Asset, Balance]
@@ -680,7 +1123,7 @@ class BuchfinkDB(DBHandler):
         if 'assets' in account:
             for balance in account['assets']:
                 try:
-                    balance, asset = deserialize_balance(balance, self)
+                    balance, asset = deserialize_balance(balance, self, with_prices)
                 except UnknownAsset as e:
                     logger.warning(str(e))
                     continue
@@ -692,7 +1135,7 @@ class BuchfinkDB(DBHandler):
         if 'liabilities' in account:
             for balance in account['liabilities']:
                 try:
-                    balance, asset = deserialize_balance(balance, self)
+                    balance, asset = deserialize_balance(balance, self, with_prices)
                 except UnknownAsset as e:
                     logger.warning(str(e))
                     continue
@@ -703,18 +1146,116 @@ class BuchfinkDB(DBHandler):
 
         return BalanceSheet(assets=assets, liabilities=liabilities)
 
-    def write_balances(self, account: Account, balances: BalanceSheet):
+    def is_partitioned(self, directory: Path, account_name: str) -> bool:
+        """
+        Events of an account are partitioned into one file per year, i.e.
+        <directory>/<account>/<year>.yaml, if enabled in the settings or if
+        such a directory already exists.
+        """
+        return bool(self.config.settings.partition_by_year) \
+            or (directory / account_name).is_dir()
+
+    def iter_event_files(self, directory: Path, account_name: str,
+            from_ts: Optional[Timestamp] = None, to_ts: Optional[Timestamp] = None) \
+            -> Iterator[Path]:
+        """
+        Yields the files holding the events of an account. Partitions for years
+        outside of the given time range are skipped.
+        """
+        flat_file = directory / (account_name + '.yaml')
+        if flat_file.exists():
+            yield flat_file
+
+        partition_directory = directory / account_name
+        if not partition_directory.is_dir():
+            return
+
+        for partition_file in sorted(partition_directory.glob('*.yaml')):
+            if not partition_file.stem.isdigit():
+                continue
+            year = int(partition_file.stem)
+            if from_ts is not None and year_start_ts(year + 1) <= from_ts:
+                continue
+            if to_ts is not None and year_start_ts(year) > to_ts:
+                continue
+            yield partition_file
+
+    def write_account_events(self, directory: Path, account_name: str, root_key: str,
+            events: list, serialize) -> None:
+        """
+        Writes the (sorted) events of an account either to a single file or,
+        if partitioned, to one file per year. Only files whose events changed
+        are written to.
+        """
+        flat_file = directory / (account_name + '.yaml')
+        partition_directory = directory / account_name
+
+        if not self.is_partitioned(directory, account_name):
+            if events:
+                write_events(self.cache_directory, flat_file, root_key, events,
+                        self.get_events_fingerprint(), serialize)
+            elif flat_file.exists():
+                flat_file.unlink()
+            return
+
+        partitions = {}  # type: Dict[int, list]
+        for event in events:
+            year = datetime.fromtimestamp(event.get_timestamp(), tz=timezone.utc).year
+            partitions.setdefault(year, []).append(event)
+
+        if partitions:
+            partition_directory.mkdir(exist_ok=True)
+        for year, year_events in partitions.items():
+            write_events(self.cache_directory, partition_directory / f'{year}.yaml', root_key,
+                    year_events, self.get_events_fingerprint(), serialize)
+
+        for partition_file in partition_directory.glob('*.yaml'):
+            if partition_file.stem.isdigit() and int(partition_file.stem) not in partitions:
+                logger.debug('Removing empty partition %s', partition_file)
+                partition_file.unlink()
+
+        if flat_file.exists():
+            logger.info('Moved events from %s to %s', flat_file, partition_directory)
+            flat_file.unlink()
+
+    def write_actions(self, account_name: str,
+            actions: List[Union[LedgerAction, HistoryBaseEntry]]):
+        'Writes the actions of an account, only serializing what changed since the last write'
+        self.write_account_events(
+            self.actions_directory,
+            account_name,
+            'actions',
+            sorted(actions, key=lambda action: (action.get_timestamp(),)),
+            serialize_events
+        )
+
+    def write_trades(self, account_name: str, trades: List[Trade]):
+        'Writes the trades of an account, only serializing what changed since the last write'
+        self.write_account_events(
+            self.trades_directory,
+            account_name,
+            'trades',
+            sorted(trades, key=lambda trade: (trade.timestamp, trade.link)),
+            serialize_trades
+        )
+
+    def write_balances(self, account: Account, balances: Optional[BalanceSheet],
+            nfts: Optional[List[Nfts]] = None):
+        """
+        Updates the balances file of an account with new balances and/or NFTs
+        in a single atomic write. Other contents of the file are kept. If the
+        contents did not change, the file is not touched at all.
+        """
         path = self.balances_directory / (account.name + '.yaml')
 
         try:
-            with path.open('r') as balances_file:
-                contents = yaml.load(balances_file, Loader=yaml.SafeLoader)
-                if contents is None:
-                    contents = {}
+            old_text = path.read_text()  # type: Optional[str]
         except FileNotFoundError:
-            contents = {}
+            old_text = None
+
+        contents = (yaml_io.load(old_text) if old_text else None) or {}
 
-        with path.open('w') as balances_file:
+        if balances is not None:
             contents.update(serialize_balances(balances))
 
             if not balances.liabilities and 'liabilities' in contents:
@@ -723,7 +1264,17 @@ class BuchfinkDB(DBHandler):
             if not balances.assets and 'assets' in contents:
                 del contents['assets']
 
-            yaml.dump(contents, stream=balances_file, sort_keys=True)
+        if nfts:
+            contents['nfts'] = serialize_nfts(nfts)
+
+        text = yaml_io.dump(contents, sort_keys=True)
+        if text == old_text:
+            logger.debug('Balances of %s did not change', account.name)
+            return
+
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(text)
+        os.replace(tmp_path, path)
 
     # def get_amm_swaps(
     #         self,
@@ -773,43 +1324,74 @@ class BuchfinkDB(DBHandler):
     def get_binance_pairs(self, name: str, location: Location) -> List[str]:
         return []
 
-    def perform_assets_updates(self):
-        self.assets_updater.perform_update(None, None)
+    @timings.phase('db.assets_updates')
+    def perform_assets_updates(self, force: bool = False):
+        """
+        Updates the asset database from remote sources. As this is costly, it
+        is only done once per `assets_update_ttl` seconds, unless forced.
+        """
+        from rotkehlchen.assets.spam_assets import update_spam_assets
 
-        try:
-            update_spam_assets(db=self, assets_info=[])
-        except UnknownAsset as e:
-            logger.warning(str(e))
+        state_path = self.cache_directory / 'assets_update.json'
+        state = read_state(state_path) or {}
+        now = ts_now()
+        since_last_update = now - state.get('last_update', 0)
+
+        if force or since_last_update >= self.config.settings.assets_update_ttl:
+            self.assets_updater.perform_update(None, None)
+
+            try:
+                update_spam_assets(db=self, assets_info=[])
+            except UnknownAsset as e:
+                logger.warning(str(e))
+
+            clear_asset_caches()
+
+            # Most updates do not change anything. Only record a new version
+            # if they did, as caches of events are keyed on it.
+            assets_version = self.query_assets_version()
+            if assets_version != state.get('assets_version'):
+                logger.info('Asset database has changed')
+            write_state(state_path, {'last_update': now, 'assets_version': assets_version})
+        else:
+            logger.debug('Skipping asset updates, last update was %ds ago', since_last_update)
 
         self.sync_config_assets()
 
+    @timings.phase('db.sync_rpc_nodes')
     def sync_rpc_nodes(self):
         'Ensures that the database matches the config file'
 
+        settings_rpc_nodes = list(self.config.settings.rpc_nodes or [])
+
+        if ROTKI_NODES_FILE.exists():
+            default_nodes = ROTKI_NODES_FILE.read_bytes()
+        else:
+            default_nodes = b''
+
+        fingerprint = content_hash(
+            [(rpc_node.name, rpc_node.endpoint) for rpc_node in settings_rpc_nodes],
+            default_nodes
+        )
+        state_path = self.cache_directory / 'rpc_nodes.json'
+        state = read_state(state_path) or {}
+
+        # Also check that there are nodes at all, in case the user DB has been
+        # deleted but our state file was kept
+        if state.get('fingerprint') == fingerprint and \
+                self.get_rpc_nodes(SupportedBlockchain.ETHEREUM):
+            logger.debug('RPC node config is unchanged')
+            return
+
+        logger.debug('Syncing RPC nodes to database')
+        blockchain = SupportedBlockchain.ETHEREUM.value
         with self.user_write() as cursor:
             # Not the best solution but the easiest to implement :blush:
             cursor.execute('DELETE FROM rpc_nodes;')
             read_and_write_nodes_in_database(cursor)
 
-        settings_rpc_nodes = list(self.config.settings.rpc_nodes or [])
-        db_rpc_nodes = list(self.get_rpc_nodes(SupportedBlockchain.ETHEREUM))
-
-        for db_rpc_node in db_rpc_nodes:
-            if db_rpc_node.node_info.owned:  # do not delete preconfigured nodes
-                if db_rpc_node.node_info.name in [n.name for n in settings_rpc_nodes]:
-                    # TODO: should update web3 node in db if necessary
-                    settings_rpc_nodes = [
-                        n for n in settings_rpc_nodes if n.name != db_rpc_node.node_info.name
-                    ]
-                else:
-                    self.delete_rpc_node(
-                            db_rpc_node.identifier,
-                            blockchain=SupportedBlockchain.ETHEREUM
-                    )
-
-        for rpc_node in settings_rpc_nodes:
-            self.add_rpc_node(
-                WeightedNode(
+            for rpc_node in settings_rpc_nodes:
+                node = WeightedNode(
                     identifier=rpc_node.name,
                     node_info=NodeName(
                         name=rpc_node.name,
@@ -820,14 +1402,84 @@ class BuchfinkDB(DBHandler):
                     weight=FVal(0.4),
                     active=True,
                 )
-            )
+                cursor.execute(
+                    'SELECT identifier, name, endpoint, weight FROM rpc_nodes WHERE blockchain=?',
+                    (blockchain,)
+                )
+                existing_nodes = cursor.fetchall()
+                if any(name == rpc_node.name or endpoint == rpc_node.endpoint
+                        for _, name, endpoint, _ in existing_nodes):
+                    logger.warning(
+                        'Ignoring RPC node "%s", a node with the same name or endpoint exists',
+                        rpc_node.name
+                    )
+                    continue
+
+                # Like DBHandler.add_rpc_node(), the new node gets its weight and
+                # the other nodes share the rest in proportion to their weights
+                weight_sum = sum((FVal(weight) for *_, weight in existing_nodes), FVal(0))
+                if weight_sum > 0:
+                    cursor.executemany(
+                        'UPDATE rpc_nodes SET weight=? WHERE identifier=?',
+                        [
+                            (str(FVal(weight) / weight_sum * (1 - node.weight)), identifier)
+                            for identifier, _, _, weight in existing_nodes
+                        ]
+                    )
+                cursor.execute(
+                    'INSERT INTO rpc_nodes('
+                    'name, endpoint, owned, active, weight, blockchain'
+                    ') VALUES (?, ?, ?, ?, ?, ?)',
+                    node.serialize_for_db()
+                )
+
+        write_state(state_path, {'fingerprint': fingerprint})
 
     def sync_config_assets(self):
         'Sync assets defined in config with database'
-
-        for token in self.config.tokens:
+        self.sync_config_tokens()
+        self.sync_ignored_assets()
+
+    def sync_config_tokens(self):
+        """
+        Sync tokens defined in config with the global DB. We remember a hash
+        per token in the cache directory, so that only new or changed tokens
+        have to be looked at. All tokens are looked at again after an asset
+        update that changed the global DB, which may have changed them.
+        """
+        state_path = self.cache_directory / 'tokens.json'
+        state = read_state(state_path) or {}
+        token_hashes = {
+            str(token.address): content_hash(token.dict()) for token in self.config.tokens
+        }
+        assets_version = self.get_assets_version()
+        fingerprint = content_hash(token_hashes, assets_version)
+
+        # Also check that the tokens still exist, in case the global DB has
+        # been recreated but our state file was kept
+        synced_identifiers = state.get('identifiers')  # type: Optional[Dict[str, str]]
+        if state.get('fingerprint') == fingerprint and synced_identifiers is not None and \
+                self.has_global_assets(list(synced_identifiers.values())):
+            logger.debug('Tokens in config are unchanged')
+            return
+
+        synced_hashes = state.get('tokens', {})
+        if state.get('assets_version') != assets_version or synced_identifiers is None or \
+                not self.has_global_assets(list(synced_identifiers.values())):
+            synced_hashes, synced_identifiers = {}, {}
+        changed_tokens = [
+            token for token in self.config.tokens
+            if synced_hashes.get(str(token.address)) != token_hashes[str(token.address)]
+        ]
+        added_identifiers = []
+        identifiers = dict(synced_identifiers)
+
+        logger.debug('Syncing %d changed token(s) to database', len(changed_tokens))
+
+        for token in changed_tokens:
             eth_token = deserialize_evm_token(token.dict())
             identifier = 'eip155:1/erc20:' + eth_token.evm_address
+            identifiers[str(token.address)] = identifier
 
             try:
                 evm_token = self.globaldb.get_evm_token(eth_token.evm_address, eth_token.chain_id)
@@ -836,55 +1488,125 @@ class BuchfinkDB(DBHandler):
                 logger.debug('Asset already exists: %s', evm_token)
 
                 # This could be more involved
-                if eth_token.coingecko and eth_token.coingecko != evm_token.coingecko:
-                    logger.info('Updating asset db for token: %s', eth_token)
-                    self.globaldb.edit_evm_token(eth_token)
-
-                if eth_token.decimals and eth_token.decimals != evm_token.decimals:
+                if (eth_token.coingecko and eth_token.coingecko != evm_token.coingecko) or \
+                        (eth_token.decimals and eth_token.decimals != evm_token.decimals):
                     logger.info('Updating asset db for token: %s', eth_token)
                     self.globaldb.edit_evm_token(eth_token)
 
             except UnknownAsset:
                 self.globaldb.add_asset(identifier, AssetType.EVM_TOKEN, eth_token)
-                try:
-                    self.get_asset_by_symbol(identifier)
-                except UnknownAsset as exc:
-                    raise ValueError('Unable to add asset: ' + str(eth_token)) from exc
+                added_identifiers.append((identifier, eth_token))
 
+        if changed_tokens:
             self.asset_resolver.clean_memory_cache()
+            clear_asset_caches()
+
+        for identifier, eth_token in added_identifiers:
+            try:
+                self.get_asset_by_symbol(identifier)
+            except UnknownAsset as exc:
+                raise ValueError('Unable to add asset: ' + str(eth_token)) from exc
+
+        write_state(state_path, {
+            'fingerprint': fingerprint,
+            'assets_version': assets_version,
+            'tokens': token_hashes,
+            'identifiers': {address: identifiers[address] for address in token_hashes}
+        })
+
+    def get_global_assets(self, identifiers: List[str]) -> Set[str]:
+        'Returns those of the given asset identifiers that exist in the global DB'
+        if not identifiers:
+            return set()
+        with self.globaldb.conn.read_ctx() as cursor:
+            cursor.execute(
+                'SELECT identifier FROM assets WHERE identifier IN ({0})'.format(
+                    ','.join('?' * len(identifiers))
+                ),
+                identifiers
+            )
+            return {identifier for (identifier,) in cursor}
+
+    def has_global_assets(self, identifiers: List[str]) -> bool:
+        'Returns whether all of the given asset identifiers exist in the global DB'
+        return len(self.get_global_assets(identifiers)) == len(set(identifiers))
+
+    def sync_ignored_assets(self):
+        """
+        Sync ignored assets defined in config with database. Tokens that are
+        already in the global DB are looked up in one query. The remaining
+        ones have to be created one by one, as the global DB has no API to
+        add assets in bulk.
+        """
+        from rotkehlchen.assets.utils import get_or_create_evm_token
+
+        start_time = time.perf_counter()
 
         with self.conn.read_ctx() as cursor:
             ignored_assets = {asset.identifier for asset in self.get_ignored_assets(cursor)}
 
+        # Maps the identifier of every configured ignored asset to its address
+        config_assets = {}  # type: Dict[str, ChecksumEvmAddress]
         for ignored_asset in self.config.settings.ignored_assets:
-
             token_identifier = deserialize_identifier(ignored_asset)
-
-            if token_identifier in ignored_assets:
+            try:
+                token_address = deserialize_evm_address(token_identifier.split(':')[-1])
+            except DeserializationError as exc:
+                logger.warning('Unable to add ignored asset %s: %s', ignored_asset, str(exc))
                 continue
 
+            # Identifiers hold the checksummed address, or they never match
             if ':' in token_identifier:
-                token_address = token_identifier.split(':')[-1]
+                token_identifier = token_identifier.rsplit(':', 1)[0] + ':' + token_address
             else:
-                token_address = token_identifier
+                token_identifier = 'eip155:1/erc20:' + token_address
+
+            config_assets[token_identifier] = token_address
+
+        missing_assets = [
+            token_identifier for token_identifier in config_assets
+            if token_identifier not in ignored_assets
+        ]
 
+        if not missing_assets:
+            logger.debug('All %d ignored asset(s) are already in DB', len(config_assets))
+            return
+
+        existing_assets = self.get_global_assets(missing_assets)
+        assets = [Asset(identifier) for identifier in existing_assets]  # type: List[Asset]
+        for token_identifier in missing_assets:
+            if token_identifier in existing_assets:
+                continue
             try:
-                token = get_or_create_evm_token(
+                assets.append(get_or_create_evm_token(
                     userdb=self,
-                    evm_address=token_address,
+                    evm_address=config_assets[token_identifier],
                     chain_id=ChainID.ETHEREUM,
                     protocol=SPAM_PROTOCOL,
                     decimals=18,
-                )
+                ))
             except InputError as exc:
                 logger.warning('Unable to add ignored asset: %s', str(exc))
-                continue
 
-            logger.debug('Adding to ignored assets: %s', token)
-            with self.user_write() as cursor:
-                self.add_to_ignored_assets(write_cursor=cursor, asset=token)
+        with self.user_write() as cursor:
+            for asset in assets:
+                logger.debug('Adding to ignored assets: %s', asset)
+                self.add_to_ignored_assets(write_cursor=cursor, asset=asset)
+
+        logger.info(
+            'Added %d of %d ignored asset(s) to DB (%d created) in %.2fs',
+            len(assets),
+            len(config_assets),
+            len(assets) - len(existing_assets),
+            time.perf_counter() - start_time
+        )
 
+    @timings.phase('db.sync_manual_prices')
     def sync_manual_prices(self):
+        """
+        Ensures that the manual prices in the global DB match the config file.
+        Only prices that were removed, added or changed are written.
+        """
         def to_historical_price(historical_price: HistoricalPriceConfig) -> HistoricalPrice:
             return HistoricalPrice(
                 from_asset=self.get_asset_by_symbol(historical_price.from_),
@@ -894,12 +1616,47 @@ class BuchfinkDB(DBHandler):
                 timestamp=Timestamp(int(historical_price.at.timestamp()))
             )
 
-        prices = [to_historical_price(historical_price) for historical_price in self.config.prices]
-        for price in prices:
-            logger.debug('Adding %s', price)
-            self.globaldb.delete_historical_prices(
-                    price.from_asset,
-                    price.to_asset,
-                    HistoricalPriceOracle.MANUAL
+        # Entries are (from_asset, to_asset, source_type, timestamp, price) and
+        # the first four columns are the primary key of the price_history table
+        config_prices = {
+            entry[:4]: entry for entry in (
+                to_historical_price(historical_price).serialize_for_db()
+                for historical_price in self.config.prices
+            )
+        }
+
+        with self.globaldb.conn.read_ctx() as cursor:
+            cursor.execute(
+                'SELECT from_asset, to_asset, source_type, timestamp, price '
+                'FROM price_history WHERE source_type=?',
+                (HistoricalPriceOracle.MANUAL.serialize_for_db(),)
+            )
+            db_prices = {tuple(entry[:4]): tuple(entry) for entry in cursor}
+
+        removed_prices = [key for key in db_prices if key not in config_prices]
+        changed_prices = [
+            entry for key, entry in config_prices.items() if db_prices.get(key) != entry
+        ]
+
+        if not removed_prices and not changed_prices:
+            logger.debug('Manual prices are unchanged')
+            return
+
+        logger.debug(
+            'Removing %d and adding/updating %d manual price(s)',
+            len(removed_prices),
+            len(changed_prices)
+        )
+
+        with self.globaldb.conn.write_ctx() as write_cursor:
+            write_cursor.executemany(
+                'DELETE FROM price_history WHERE '
+                'from_asset=? AND to_asset=? AND source_type=? AND timestamp=?',
+                removed_prices
+            )
+            write_cursor.executemany(
+                'INSERT OR REPLACE INTO price_history('
+                'from_asset, to_asset, source_type, timestamp, price'
+                ') VALUES (?, ?, ?, ?, ?)',
+                changed_prices
             )
-        self.globaldb.add_historical_prices(prices)
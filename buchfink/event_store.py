@@ -0,0 +1,135 @@
+"""
+An optional SQLite mirror (.buchfink/events.sqlite) of the trades and actions
+YAML files, enabled by the `event_store` setting.
+
+The YAML files stay the source of truth. For every file the store remembers
+the key it was synced at; files whose key changed are re-read and their rows
+replaced, all other files are left alone. Each row holds the serialized entry
+as it appears in the YAML file, together with its timestamp and the
+identifiers of its assets, so that queries by account, time range and asset
+are index lookups and only the matching entries have to be deserialized.
+"""
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump this when the schema changes, the store is then rebuilt from scratch
+EVENT_STORE_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    account TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (path, kind)
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    account TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_account ON events (account, kind, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_path ON events (path, kind);
+CREATE TABLE IF NOT EXISTS event_assets (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    asset TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS event_assets_by_asset ON event_assets (asset, event_id);
+CREATE INDEX IF NOT EXISTS event_assets_by_event ON event_assets (event_id);
+'''
+
+# (offset in the file, timestamp, serialized entry, asset identifiers)
+EventRow = Tuple[int, int, dict, Sequence[str]]
+
+
+class EventStore:
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != EVENT_STORE_VERSION:
+            logger.debug('Rebuilding event store %s (version %s)', path, version)
+            with self.conn:
+                self.conn.executescript(
+                    'DROP TABLE IF EXISTS event_assets;'
+                    'DROP TABLE IF EXISTS events;'
+                    'DROP TABLE IF EXISTS files;'
+                )
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f'PRAGMA user_version = {EVENT_STORE_VERSION}')
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_file_keys(self, account: str, kind: str) -> dict:
+        'Returns the keys the files of an account were last synced at, by path'
+        return dict(self.conn.execute(
+            'SELECT path, key FROM files WHERE account = ? AND kind = ?', (account, kind)
+        ))
+
+    def replace_file(self, account: str, kind: str, path: str, key: str,
+            rows: Iterable[EventRow]) -> None:
+        'Replaces the events of a file in a single transaction'
+        with self.conn:
+            self._delete_file(path, kind)
+            for offset, timestamp, entry, assets in rows:
+                cursor = self.conn.execute(
+                    'INSERT INTO events (path, kind, account, offset, timestamp, entry) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (path, kind, account, offset, timestamp, json.dumps(entry, default=str))
+                )
+                self.conn.executemany(
+                    'INSERT INTO event_assets (event_id, asset) VALUES (?, ?)',
+                    [(cursor.lastrowid, asset) for asset in set(assets)]
+                )
+            self.conn.execute(
+                'INSERT INTO files (path, kind, account, key) VALUES (?, ?, ?, ?)',
+                (path, kind, account, key)
+            )
+
+    def remove_file(self, path: str, kind: str) -> None:
+        with self.conn:
+            self._delete_file(path, kind)
+
+    def _delete_file(self, path: str, kind: str) -> None:
+        self.conn.execute('DELETE FROM events WHERE path = ? AND kind = ?', (path, kind))
+        self.conn.execute('DELETE FROM files WHERE path = ? AND kind = ?', (path, kind))
+
+    def query(self, account: str, kind: str, asset: Optional[str] = None,
+            from_ts: Optional[int] = None, to_ts: Optional[int] = None) -> List[dict]:
+        """
+        Returns the serialized entries of an account, ordered by timestamp, that
+        lie within the given time range and involve the given asset identifier.
+        """
+        query = 'SELECT events.entry FROM events'
+        conditions = ['events.account = ?', 'events.kind = ?']
+        params = [account, kind]  # type: List
+
+        if asset is not None:
+            query += ' JOIN event_assets ON event_assets.event_id = events.id'
+            conditions.append('event_assets.asset = ?')
+            params.append(asset)
+        if from_ts is not None:
+            conditions.append('events.timestamp >= ?')
+            params.append(from_ts)
+        if to_ts is not None:
+            conditions.append('events.timestamp <= ?')
+            params.append(to_ts)
+
+        query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY events.timestamp, events.path, events.offset'
+
+        return [json.loads(entry) for (entry,) in self.conn.execute(query, params)]
@@ -91,6 +91,9 @@ class Settings(BaseModel):
     external_services: Optional[ExternalServicesConfig]
     rpc_nodes: Optional[List[RpcNode]]
     ignored_assets: List[str] = []
+    assets_update_ttl: int = 24 * 60 * 60
+    partition_by_year: bool = False
+    event_store: bool = False
 
 
 class AssetConfig(BaseModel):
@@ -3,14 +3,14 @@ import logging
 import os.path
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Union  # noqa: F401
 
-import yaml
 from jinja2 import Environment, FileSystemLoader
 from rotkehlchen.db.reports import DBAccountingReports
 from rotkehlchen.db.filtering import ReportDataFilterQuery
 
-from buchfink.datatypes import Timestamp
+from buchfink import timings, yaml_io
+from buchfink.datatypes import HistoryBaseEntry, LedgerAction, Timestamp, Trade  # noqa: F401
 from buchfink.db import BuchfinkDB
 from buchfink.serialization import deserialize_fval, serialize_fval
 
@@ -24,8 +24,7 @@ def run_report(buchfink_db: BuchfinkDB, accounts: List[Account], report_config:
     start_ts = Timestamp(int(report_config.from_dt.timestamp()))
     end_ts = Timestamp(int(report_config.to_dt.timestamp()))
     num_matched_accounts = 0
-    all_trades = []
-    all_actions = []
+    all_events = []  # type: List[Union[Trade, LedgerAction, HistoryBaseEntry]]
 
     root_logger = logging.getLogger('')
     formatter = logging.Formatter('%(levelname)s: %(message)s')
@@ -51,25 +50,37 @@ def run_report(buchfink_db: BuchfinkDB, accounts: List[Account], report_config:
 
     logger.info('Generating report "%s"...', name)
 
-    for account in accounts:
-        num_matched_accounts += 1
-        all_trades.extend(buchfink_db.get_local_trades_for_account(account))
-        all_actions.extend(buchfink_db.get_local_ledger_actions_for_account(account))
+    # Events are streamed into a single list, which is sorted in place, so
+    # that we do not hold several copies of the whole history at once. All
+    # trades go first so that events with equal timestamps keep their order.
+    # Events after the end of the report are not processed, so they are not
+    # loaded either. Earlier events are needed for the cost basis.
+    with timings.phase('report.load_events'):
+        for account in accounts:
+            num_matched_accounts += 1
+            all_events.extend(buchfink_db.iter_local_trades_for_account(account, to_ts=end_ts))
+        num_trades = len(all_events)
+        for account in accounts:
+            all_events.extend(
+                buchfink_db.iter_local_ledger_actions_for_account(account, to_ts=end_ts)
+            )
 
     logger.info('Collected %d trades / %d actions from %d exchange account(s)',
-            len(all_trades), len(all_actions), num_matched_accounts)
+            num_trades, len(all_events) - num_trades, num_matched_accounts)
 
     def timestamp(act):
         return act.get_timestamp()
 
-    all_events = sorted(all_trades + all_actions, key=timestamp)
+    all_events.sort(key=timestamp)
     accountant = buchfink_db.get_accountant()
-    report_id = accountant.process_history(start_ts, end_ts, all_events)
+    with timings.phase('report.process_history'):
+        report_id = accountant.process_history(start_ts, end_ts, all_events)
 
     root_logger.removeHandler(file_handler)
     root_logger.removeHandler(error_handler)
 
-    accountant.export(buchfink_db.reports_directory / Path(name))
+    with timings.phase('report.export'):
+        accountant.export(buchfink_db.reports_directory / Path(name))
 
     dbpnl = DBAccountingReports(accountant.csvexporter.database)
     results, _ = dbpnl.get_reports(report_id=report_id, with_limit=False)
@@ -88,7 +99,7 @@ def run_report(buchfink_db: BuchfinkDB, accounts: List[Account], report_config:
     report_data['pnl_totals'] = get_total_pnl_from_overview(report_data['overview'])
 
     with (folder / 'report.yaml').open('w') as report_file:
-        yaml.dump(report_data, stream=report_file)
+        yaml_io.dump(report_data, stream=report_file)
 
     logger.info('Report information has been written to: %s',
             buchfink_db.reports_directory / Path(name)
@@ -108,7 +119,7 @@ def render_report(buchfink_db: BuchfinkDB, report_config: ReportConfig):
     # This is a little hacky and breaks our philosophy as we explicitely deal
     # with DB identifier here
     with (folder / 'report.yaml').open('r') as report_file:
-        overview_data = yaml.load(report_file, Loader=yaml.SafeLoader)
+        overview_data = yaml_io.load(report_file)
         report_id = overview_data['identifier']
 
     @lru_cache
@@ -1,8 +1,9 @@
 import re
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from operator import itemgetter
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import dateutil.parser
 from rotkehlchen.assets.utils import symbol_to_asset_or_token
@@ -37,112 +38,113 @@ def serialize_timestamp_ms(timestamp_ms: int) -> str:
     return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).isoformat()
 
 
+# Resolved assets by their serialized form, see resolve_assets()
+AssetTable = Dict[str, Union[Asset, Exception]]
+
+# Timestamps written by serialize_timestamp(), e.g. 2022-01-01T12:00:00+00:00
+UTC_SUFFIX = '+00:00'
+UTC_TIMESTAMP_LENGTH = 25
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+# Events of the same transaction or block share their timestamp, and they are
+# next to each other in the files, so a small cache suffices
+TIMESTAMP_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_timestamp(value: str) -> Timestamp:
+    """
+    Parses an ISO 8601 date or time to a UNIX timestamp. The form written by
+    serialize_timestamp() takes a fast path. A trailing Z denotes UTC, times
+    without a timezone are interpreted as local time.
+    """
+    if len(value) == UTC_TIMESTAMP_LENGTH and value.endswith(UTC_SUFFIX):
+        try:
+            return Timestamp((datetime.fromisoformat(value[:-6]) - EPOCH) // ONE_SECOND)
+        except ValueError:
+            pass
+
+    if value.endswith('Z'):
+        value = value[:-1] + UTC_SUFFIX
+    try:
+        return Timestamp(int(datetime.fromisoformat(value).timestamp()))
+    except ValueError:
+        # ISO 8601 forms that datetime does not support, e.g. 20220101T120000
+        return Timestamp(int(dateutil.parser.isoparse(value).timestamp()))
+
+
+def parse_timestamps(values: Iterable[str]) -> List[Timestamp]:
+    'Parses many timestamps at once, parsing each distinct value only once'
+    parse = parse_timestamp.__wrapped__  # the batch is its own cache
+    parsed = {}  # type: Dict[str, Timestamp]
+    result = []
+    for value in values:
+        timestamp = parsed.get(value)
+        if timestamp is None:
+            timestamp = parsed[value] = parse(value)
+        result.append(timestamp)
+    return result
+
+
 def deserialize_timestamp(timestamp: str) -> Timestamp:
     'Converts ISO date or a UNIX timestamp to a Timestamp'
     if timestamp.endswith('Z'):
+        # Unlike parse_timestamp(), this has always read these as local time
         timestamp = timestamp[:-1]
+    if timestamp.isdigit():
+        return Timestamp(int(timestamp))
     try:
-        return int(datetime.fromisoformat(timestamp).timestamp())
+        return parse_timestamp(timestamp)
     except ValueError:
-        return int(timestamp)
+        return Timestamp(int(timestamp))
 
 
 def deserialize_timestamp_ms(timestamp: str) -> Timestamp:
     return deserialize_timestamp(timestamp) * 1000
 
 
-def deserialize_ledger_action_type(action_type: str) -> LedgerActionType:
-    if action_type == 'income':
-        return LedgerActionType.INCOME
-    if action_type == 'airdrop':
-        return LedgerActionType.AIRDROP
-    if action_type == 'loss':
-        return LedgerActionType.LOSS
-    if action_type == 'expense':
-        return LedgerActionType.EXPENSE
-    raise ValueError(f'Unknown ledger action type: {action_type}')
-
-
-def deserialize_ledger_action(action_dict) -> LedgerAction:
-    if 'income' in action_dict:
-        amount, asset = deserialize_amount(action_dict['income'])
-        return LedgerAction(
-            identifier=None,
-            location='',
-            action_type=LedgerActionType.INCOME,
-            amount=amount,
-            rate=None,
-            rate_asset=None,
-            timestamp=deserialize_timestamp(action_dict['timestamp']),
-            asset=asset,
-            notes=action_dict.get('notes', ''),
-            link=action_dict.get('link', '')
-        )
-
-    if 'airdrop' in action_dict:
-        amount, asset = deserialize_amount(action_dict['airdrop'])
-        return LedgerAction(
-            identifier=None,
-            location='',
-            action_type=LedgerActionType.AIRDROP,
-            amount=amount,
-            rate=None,
-            rate_asset=None,
-            timestamp=deserialize_timestamp(action_dict['timestamp']),
-            asset=asset,
-            notes=action_dict.get('notes', ''),
-            link=action_dict.get('link', '')
-        )
+# The key of the amount in a serialized ledger action is its lowercased type,
+# e.g. "income: 1.5 ETH" or "dividends_income: 10 USD"
+LEDGER_ACTION_KEYS = {
+    action_type: action_type.name.lower() for action_type in LedgerActionType
+}  # type: Dict[LedgerActionType, str]
+LEDGER_ACTION_TYPES = {
+    key: action_type for action_type, key in LEDGER_ACTION_KEYS.items()
+}  # type: Dict[str, LedgerActionType]
 
-    if 'loss' in action_dict:
-        amount, asset = deserialize_amount(action_dict['loss'])
-        return LedgerAction(
-            identifier=None,
-            location='',
-            action_type=LedgerActionType.LOSS,
-            amount=amount,
-            rate=None,
-            rate_asset=None,
-            timestamp=deserialize_timestamp(action_dict['timestamp']),
-            asset=asset,
-            notes=action_dict.get('notes', ''),
-            link=action_dict.get('link', '')
-        )
 
-    if 'gift' in action_dict:
-        amount, asset = deserialize_amount(action_dict['gift'])
-        return LedgerAction(
-            identifier=None,
-            location='',
-            action_type=LedgerActionType.GIFT,
-            amount=amount,
-            rate=None,
-            rate_asset=None,
-            timestamp=deserialize_timestamp(action_dict['timestamp']),
-            asset=asset,
-            notes=action_dict.get('notes', ''),
-            link=action_dict.get('link', '')
-        )
+def deserialize_ledger_action_type(action_type: str) -> LedgerActionType:
+    try:
+        return LEDGER_ACTION_TYPES[action_type]
+    except KeyError:
+        raise ValueError(f'Unknown ledger action type: {action_type}') from None
 
-    if 'expense' in action_dict:
-        amount, asset = deserialize_amount(action_dict['expense'])
-        return LedgerAction(
-            identifier=None,
-            location='',
-            action_type=LedgerActionType.EXPENSE,
-            amount=amount,
-            rate=None,
-            rate_asset=None,
-            timestamp=deserialize_timestamp(action_dict['timestamp']),
-            asset=asset,
-            notes=action_dict.get('notes', ''),
-            link=action_dict.get('link', '')
-        )
 
-    raise ValueError(f'Unable to parse ledger action: {action_dict}')
+def deserialize_ledger_action(action_dict, assets: Optional[AssetTable] = None) -> LedgerAction:
+    for key in action_dict:
+        action_type = LEDGER_ACTION_TYPES.get(key)
+        if action_type is not None:
+            break
+    else:
+        raise ValueError(f'Unable to parse ledger action: {action_dict}')
+
+    amount, asset = deserialize_amount(action_dict[key], assets)
+    return LedgerAction(
+        identifier=None,
+        location='',
+        action_type=action_type,
+        amount=amount,
+        rate=None,
+        rate_asset=None,
+        timestamp=deserialize_timestamp(action_dict['timestamp']),
+        asset=asset,
+        notes=action_dict.get('notes', ''),
+        link=action_dict.get('link', '')
+    )
 
 
-def deserialize_trade(trade_dict) -> Trade:
+def deserialize_trade(trade_dict, assets: Optional[AssetTable] = None) -> Trade:
     if 'pair' in trade_dict:
         return Trade(
             trade_dict['timestamp'],
@@ -158,14 +160,14 @@ def deserialize_trade(trade_dict) -> Trade:
 
     if 'buy' in trade_dict:
         trade_type = TradeType.BUY
-        amount, base_asset = deserialize_amount(trade_dict['buy'])
+        amount, base_asset = deserialize_amount(trade_dict['buy'], assets)
     elif 'sell' in trade_dict:
         trade_type = TradeType.SELL
-        amount, base_asset = deserialize_amount(trade_dict['sell'])
+        amount, base_asset = deserialize_amount(trade_dict['sell'], assets)
     else:
         raise ValueError('Invalid trade: ' + str(trade_dict))
 
-    quote_amount, quote_asset = deserialize_amount(trade_dict['for'])
+    quote_amount, quote_asset = deserialize_amount(trade_dict['for'], assets)
 
     if base_asset is None:
         raise ValueError('No base asset provided')
@@ -174,12 +176,12 @@ def deserialize_trade(trade_dict) -> Trade:
         raise ValueError('No quote asset provided')
 
     if 'fee' in trade_dict:
-        fee, fee_currency = deserialize_amount(trade_dict['fee'])
+        fee, fee_currency = deserialize_amount(trade_dict['fee'], assets)
     else:
         fee, fee_currency = FVal('0'), quote_asset
 
     return Trade(
-        dateutil.parser.isoparse(trade_dict['timestamp']).timestamp(),
+        parse_timestamp(trade_dict['timestamp']),
         trade_dict.get('location', ''),
         base_asset,
         quote_asset,
@@ -193,6 +195,10 @@ def deserialize_trade(trade_dict) -> Trade:
 
 
 QUANT_DECIMAL = Decimal('0.00000000000001')
+
+# A file with many events usually only references a few hundred distinct
+# assets, so (de)serialized assets are memoized, see clear_asset_caches()
+ASSET_CACHE_SIZE = 4096
 RE_IRREGULAR_CHAR = re.compile(r'[^a-zA-Z0-9\-\+]+')
 
 
@@ -208,6 +214,12 @@ def serialize_decimal(dec: Decimal) -> str:
 
 
 def serialize_asset(asset: Asset) -> str:
+    return _serialize_asset(asset)
+
+
+# Assets are hashed and compared by identifier, so this memoizes by identifier
+@lru_cache(maxsize=ASSET_CACHE_SIZE)
+def _serialize_asset(asset: Asset) -> str:
     asset_name = asset.symbol_or_name()
 
     if RE_IRREGULAR_CHAR.search(asset_name):
@@ -232,6 +244,20 @@ def serialize_asset(asset: Asset) -> str:
     return f'{asset_name}[{asset.identifier}]'
 
 
+def clear_asset_caches() -> None:
+    'Must be called whenever the assets in the global DB change'
+    _serialize_asset.cache_clear()
+    _deserialize_asset.cache_clear()
+
+
+def get_asset_cache_info() -> Dict[str, Any]:
+    'Returns the hits, misses and size of the asset caches'
+    return {
+        'serialize_asset': _serialize_asset.cache_info(),
+        'deserialize_asset': _deserialize_asset.cache_info()
+    }
+
+
 def serialize_amount(amount: FVal, asset: Asset) -> str:
     return '{0} {1}'.format(serialize_decimal(amount.num), serialize_asset(asset))
 
@@ -263,109 +289,159 @@ def serialize_balances(balances: BalanceSheet, skip_nfts=True) -> dict:
     return ser_balances
 
 
-def deserialize_balance(balance: Dict[str, Any], buchfink_db) -> Tuple[Balance, Asset]:
+def deserialize_balance(balance: Dict[str, Any], buchfink_db, with_price=True) \
+        -> Tuple[Balance, Asset]:
+    'Deserializes a balance, pricing it in USD unless with_price is False'
     amount = FVal(balance['amount'])
     asset = buchfink_db.get_asset_by_symbol(balance['asset'])
+    if not with_price:
+        return Balance(amount), asset
     usd_value = amount * FVal(buchfink_db.inquirer.find_usd_price(asset))
     return Balance(amount, usd_value), asset
 
 
-def deserialize_amount(amount: str) -> Tuple[FVal, Optional[Asset]]:
+def deserialize_amount(amount: str, assets: Optional[AssetTable] = None) \
+        -> Tuple[FVal, Optional[Asset]]:
+    """
+    Deserializes an amount like "1.5 ETH". If given, the asset is looked up in
+    `assets`, as returned by resolve_assets().
+    """
     elems = amount.split(' ')
     amount = FVal(elems[0])
-    asset = deserialize_asset(elems[1]) if len(elems) > 1 else None
-    return amount, asset
+    if len(elems) < 2:
+        return amount, None
+    if assets is not None and elems[1] in assets:
+        asset = assets[elems[1]]
+        if isinstance(asset, Exception):
+            raise asset.with_traceback(None)
+        return amount, asset
+    return amount, deserialize_asset(elems[1])
+
+
+def resolve_assets(events: Iterable[dict]) -> AssetTable:
+    """
+    Resolves the distinct assets referenced by the given serialized events in
+    one pass. Assets that cannot be resolved map to the exception raised.
+    """
+    symbols = set()
+    for event in events:
+        for key in AMOUNT_KEYS:
+            value = event.get(key)
+            if isinstance(value, str):
+                elems = value.split(' ')
+                if len(elems) > 1:
+                    symbols.add(elems[1])
+
+    assets = {}  # type: AssetTable
+    for symbol in symbols:
+        try:
+            assets[symbol] = deserialize_asset(symbol)
+        except (UnknownAsset, ValueError) as exc:
+            assets[symbol] = exc
+    return assets
+
+
+def deserialize_trades(trades: List[dict]) \
+        -> Tuple[List[Optional[Trade]], List[Tuple[int, Exception]]]:
+    """
+    Deserializes a list of trades. Returns the trades, with None in place of
+    trades that could not be deserialized, and (index, exception) per error.
+    """
+    assets = resolve_assets(trades)
+    result = []  # type: List[Optional[Trade]]
+    errors = []  # type: List[Tuple[int, Exception]]
+    for index, trade in enumerate(trades):
+        try:
+            result.append(deserialize_trade(trade, assets))
+        except (UnknownAsset, ValueError, KeyError) as exc:
+            result.append(None)
+            errors.append((index, exc))
+    return result, errors
+
+
+def deserialize_actions(actions: List[dict], include_trades: bool = True) \
+        -> Tuple[List[Optional[Union[Trade, LedgerAction, HistoryBaseEntry]]],
+                List[Tuple[int, Exception]]]:
+    """
+    Deserializes a list of actions, which can also contain trades and fee
+    events. Trades are skipped (None) unless include_trades is set. Returns
+    the events and the errors like deserialize_trades().
+    """
+    assets = resolve_assets(actions)
+    result = []  # type: List[Optional[Union[Trade, LedgerAction, HistoryBaseEntry]]]
+    errors = []  # type: List[Tuple[int, Exception]]
+    for index, action in enumerate(actions):
+        try:
+            if 'buy' in action or 'sell' in action:  # it is a Trade or AMMSwap
+                result.append(deserialize_trade(action, assets) if include_trades else None)
+            elif 'spend_fee' in action:  # it is a HistoryBaseEntry
+                result.append(deserialize_event(action, assets))
+            else:
+                result.append(deserialize_ledger_action(action, assets))
+        except (UnknownAsset, ValueError, KeyError) as exc:
+            result.append(None)
+            errors.append((index, exc))
+    return result, errors
+
+
+# Keys of a serialized trade by trade type
+TRADE_KEYS = {
+    TradeType.BUY: 'buy',
+    TradeType.SELL: 'sell',
+}  # type: Dict[TradeType, str]
 
 
 def serialize_trade(trade: Union[Trade]):
-    ser_trade = trade.serialize()
+    try:
+        trade_key = TRADE_KEYS[trade.trade_type]
+    except KeyError:
+        raise ValueError('Do not know how to serialize ' + str(trade.trade_type)) from None
+
+    # Keys are added in the order they should appear in
     ser_trade = {
-        'timestamp': serialize_timestamp(trade.timestamp),
+        trade_key: serialize_amount(trade.amount, trade.base_asset),
         'for': serialize_amount(trade.rate * trade.amount, trade.quote_asset),
     }
 
-    # if isinstance(trade, AMMTrade):
-    #     ser_trade['link'] = trade.tx_hash.hex()
-    # else:
-    ser_trade['link'] = trade.link
-
     if trade.fee and trade.fee > 0:
         ser_trade['fee'] = serialize_amount(trade.fee, trade.fee_currency)
 
-    if trade.trade_type == TradeType.BUY:
-        ser_trade['buy'] = serialize_amount(trade.amount, trade.base_asset)
-    elif trade.trade_type == TradeType.SELL:
-        ser_trade['sell'] = serialize_amount(trade.amount, trade.base_asset)
-    else:
-        raise ValueError('Do not know how to serialize ' + str(trade.trade_type))
-
     if trade.location:
         ser_trade['location'] = str(trade.location)
 
-    if not ser_trade['link']:
-        del ser_trade['link']
-
-    # TODO: This should probably be implemented in the actual yaml writer
-    preferred_order = ['buy', 'sell', 'for', 'fee', 'location', 'link', 'timestamp']
+    # if isinstance(trade, AMMTrade):
+    #     ser_trade['link'] = trade.tx_hash.hex()
+    if trade.link:
+        ser_trade['link'] = trade.link
 
-    return {
-        key: ser_trade[key]
-        for key in sorted(ser_trade.keys(), key=preferred_order.index)
-    }
+    ser_trade['timestamp'] = serialize_timestamp(trade.timestamp)
+    return ser_trade
 
 
 def serialize_ledger_action(action: LedgerAction):
-    ser_action = action.serialize()
-    ser_action['timestamp'] = serialize_timestamp(action.timestamp)
-
-    if action.action_type == LedgerActionType.AIRDROP:
-        ser_action['airdrop'] = serialize_amount(FVal(action.amount), action.asset)
-        del ser_action['asset']
-        del ser_action['amount']
-        del ser_action['action_type']
-
-    elif action.action_type == LedgerActionType.INCOME:
-        ser_action['income'] = serialize_amount(FVal(action.amount), action.asset)
-        del ser_action['asset']
-        del ser_action['amount']
-        del ser_action['action_type']
-
-    elif action.action_type == LedgerActionType.GIFT:
-        ser_action['gift'] = serialize_amount(FVal(action.amount), action.asset)
-        del ser_action['asset']
-        del ser_action['amount']
-        del ser_action['action_type']
-
-    elif action.action_type == LedgerActionType.LOSS:
-        ser_action['loss'] = serialize_amount(FVal(action.amount), action.asset)
-        del ser_action['asset']
-        del ser_action['amount']
-        del ser_action['action_type']
-
-    elif action.action_type == LedgerActionType.EXPENSE:
-        ser_action['expense'] = serialize_amount(FVal(action.amount), action.asset)
-        del ser_action['asset']
-        del ser_action['amount']
-        del ser_action['action_type']
+    ser_action = {
+        LEDGER_ACTION_KEYS[action.action_type]: serialize_amount(FVal(action.amount), action.asset)
+    }
 
-    if not ser_action['identifier']:
-        del ser_action['identifier']
+    if action.identifier:
+        ser_action['identifier'] = action.identifier
 
-    if not ser_action['location']:
-        del ser_action['location']
+    if action.location:
+        ser_action['location'] = str(action.location)
 
-    if not ser_action['notes']:
-        del ser_action['notes']
+    if action.rate:
+        ser_action['rate'] = str(action.rate)
 
-    if not ser_action['link']:
-        del ser_action['link']
+    if action.rate_asset:
+        ser_action['rate_asset'] = action.rate_asset.identifier
 
-    if not ser_action['rate']:
-        del ser_action['rate']
+    if action.link:
+        ser_action['link'] = action.link
 
-    if not ser_action['rate_asset']:
-        del ser_action['rate_asset']
+    if action.notes:
+        ser_action['notes'] = action.notes
 
+    ser_action['timestamp'] = serialize_timestamp(action.timestamp)
     return ser_action
 
 
@@ -430,10 +506,10 @@ def serialize_events(actions: List[Union[LedgerAction, HistoryBaseEntry]]) -> Li
     ]
 
 
-def deserialize_event(event_dict) -> HistoryBaseEntry:
+def deserialize_event(event_dict, assets: Optional[AssetTable] = None) -> HistoryBaseEntry:
 
     if 'spend_fee' in event_dict:
-        amount, asset = deserialize_amount(event_dict['spend_fee'])
+        amount, asset = deserialize_amount(event_dict['spend_fee'], assets)
         return HistoryBaseEntry(
             event_identifier=event_dict.get('link', '').encode(),
             sequence_index=event_dict['sequence_index'],
@@ -473,6 +549,11 @@ def serialize_fval(val: FVal) -> str:
 
 ASSET_RE = re.compile(r'([^\[]+)(\[(.*)\])?')
 
+# Keys of serialized events whose values are amounts like "1.5 ETH"
+AMOUNT_KEYS = (
+    *TRADE_KEYS.values(), 'for', 'fee', *LEDGER_ACTION_KEYS.values(), 'spend_fee'
+)
+
 
 def deserialize_identifier(val: str) -> str:
     match = ASSET_RE.match(val)
@@ -486,6 +567,11 @@ def deserialize_identifier(val: str) -> str:
 
 
 def deserialize_asset(val: str) -> Asset:
+    return _deserialize_asset(val)
+
+
+@lru_cache(maxsize=ASSET_CACHE_SIZE)
+def _deserialize_asset(val: str) -> Asset:
     match = ASSET_RE.match(val)
     if match is None:
         raise ValueError(f'Could not parse asset: {val}')
@@ -0,0 +1,73 @@
+"""
+Lightweight instrumentation of named phases (opening the databases, loading
+YAML files, processing history, ...), enabled by `buchfink --timings`.
+
+Phases can be nested and entered repeatedly; the wall and CPU time of all
+calls of a phase are summed up. When timings are not enabled, `phase()` does
+nothing but check a flag.
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional  # noqa: F401
+
+from tabulate import tabulate
+
+# Maps phase names to [calls, wall seconds, cpu seconds, depth], in the
+# order in which they were first entered. None while timings are disabled.
+_timings = None  # type: Optional[Dict[str, List]]
+_depth = 0
+
+
+def enable() -> None:
+    global _timings, _depth  # pylint: disable=global-statement
+    _timings = {}
+    _depth = 0
+
+
+def is_enabled() -> bool:
+    return _timings is not None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    'Records the wall and CPU time spent in the with-block under the given name'
+    global _depth  # pylint: disable=global-statement
+    if _timings is None:
+        yield
+        return
+
+    entry = _timings.setdefault(name, [0, 0.0, 0.0, _depth])
+    _depth += 1
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        entry[0] += 1
+        entry[1] += time.perf_counter() - wall_start
+        entry[2] += time.process_time() - cpu_start
+        _depth -= 1
+
+
+def get_timings() -> List[dict]:
+    return [
+        {'phase': name, 'calls': calls, 'wall': wall, 'cpu': cpu, 'depth': depth}
+        for name, (calls, wall, cpu, depth) in (_timings or {}).items()
+    ]
+
+
+def format_timings() -> str:
+    return tabulate(
+        [
+            # tabulate strips leading whitespace, so indent nested phases with dots
+            ['. ' * timing['depth'] + timing['phase'], timing['calls'],
+                round(timing['wall'], 3), round(timing['cpu'], 3)]
+            for timing in get_timings()
+        ],
+        headers=['Phase', 'Calls', 'Wall (s)', 'CPU (s)']
+    )
+
+
+def dump_timings(path: str) -> None:
+    with open(path, 'w') as timings_file:
+        json.dump(get_timings(), timings_file, indent=2)
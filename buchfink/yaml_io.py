@@ -0,0 +1,67 @@
+"""
+All YAML files (config, trades, actions, balances, reports) are read and
+written through this module. It uses the libyaml based CSafeLoader and
+CSafeDumper if PyYAML was built with libyaml, and the pure Python
+implementations otherwise.
+
+The output must not depend on which implementation is used, as the YAML files
+are usually version-controlled. libyaml only wraps long double-quoted scalars
+(strings with escaped characters) as well as long or empty mapping keys
+differently, so such documents are always written with the pure Python dumper.
+"""
+from typing import Any, Optional
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+    HAS_LIBYAML = True
+except ImportError:
+    from yaml import SafeDumper, SafeLoader  # type: ignore
+    HAS_LIBYAML = False
+
+# libyaml and PyYAML agree on keys up to about 120 characters
+MAX_KEY_LENGTH = 100
+
+
+def _is_plain(string: str) -> bool:
+    'Strings that contain only printable ASCII are never double-quoted'
+    return string.isascii() and string.isprintable()
+
+
+def _emits_identically(data: Any) -> bool:
+    'Returns True if libyaml emits the same bytes as PyYAML for the given data'
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            if not _is_plain(value):
+                return False
+        elif isinstance(value, dict):
+            for key in value:
+                if isinstance(key, str) and \
+                        (not 0 < len(key) <= MAX_KEY_LENGTH or not _is_plain(key)):
+                    return False
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return True
+
+
+def load(stream) -> Any:
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_file(path) -> Any:
+    'Loads a YAML file. Only depends on PyYAML, so it is cheap to run in a subprocess'
+    with open(path, 'r') as yaml_file:
+        return load(yaml_file)
+
+
+def dump(data: Any, stream=None, **kwargs) -> Optional[str]:
+    if HAS_LIBYAML and _emits_identically(data):
+        dumper = SafeDumper
+    else:
+        dumper = yaml.SafeDumper
+    return yaml.dump(data, stream=stream, Dumper=dumper, **kwargs)
@@ -0,0 +1,216 @@
+import os.path
+import shutil
+import sqlite3
+
+import pytest
+
+from buchfink import yaml_io
+from buchfink.cache import load_index, write_events
+from buchfink.db import BuchfinkDB
+
+
+def test_config_cache(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    config_file = os.path.join(tmp_path, 'buchfink/buchfink.yaml')
+
+    buchfink_db = BuchfinkDB(config_file)
+    assert [acc.name for acc in buchfink_db.get_all_accounts()] == ['exchange1', 'exchange2']
+    assert os.path.exists(os.path.join(tmp_path, 'buchfink/.buchfink/config.pickle'))
+    buchfink_db.__del__()
+
+    buchfink_db = BuchfinkDB(config_file)
+    assert [acc.name for acc in buchfink_db.get_all_accounts()] == ['exchange1', 'exchange2']
+    assert len(list(buchfink_db.get_all_reports())) == 2
+    buchfink_db.__del__()
+
+    with open(config_file, 'r') as config:
+        contents = config.read()
+    with open(config_file, 'w') as config:
+        config.write(contents.replace('name: exchange2', 'name: exchange3'))
+
+    buchfink_db = BuchfinkDB(config_file)
+    assert [acc.name for acc in buchfink_db.get_all_accounts()] == ['exchange1', 'exchange3']
+
+
+def test_events_cache(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+    trades_file = os.path.join(tmp_path, 'buchfink/exchange1.yaml')
+
+    trades = buchfink_db.get_local_trades_for_account('exchange1')
+    assert len(trades) == 2
+    assert len(os.listdir(os.path.join(tmp_path, 'buchfink/.buchfink/events'))) == 1
+
+    # Unchanged files are loaded from the cache
+    assert buchfink_db.get_local_trades_for_account('exchange1') == trades
+    assert buchfink_db.parse_trades_file(trades_file) == trades
+
+    # Changed files are parsed again
+    with open(trades_file, 'r') as trades_f:
+        contents = trades_f.read()
+    with open(trades_file, 'w') as trades_f:
+        trades_f.write(contents.replace('16000 USD', '160000 USD'))
+
+    trades = buchfink_db.get_local_trades_for_account('exchange1')
+    assert str(trades[1].rate) == '160000'
+
+
+def test_events_index(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+    trades_file = tmp_path / 'buchfink' / 'exchange1.yaml'
+    btc, eth = buchfink_db.get_asset_by_symbol('BTC'), buchfink_db.get_asset_by_symbol('ETH')
+
+    trades = buchfink_db.get_local_trades_for_account('exchange1', asset=btc)
+    assert len(trades) == 2
+
+    index = load_index(buchfink_db.cache_directory, trades_file, 'trades',
+            buchfink_db.get_events_fingerprint())
+    assert index['assets'][btc.identifier] == [0, 1]
+    assert index['min_ts'] == trades[0].timestamp
+    assert index['max_ts'] == trades[1].timestamp
+
+    # With a warm events cache, queries by asset do not parse the file again
+    def fail(*args):
+        raise AssertionError('File was parsed')
+
+    buchfink_db.read_events_entries = fail
+    assert buchfink_db.get_local_trades_for_account('exchange1', asset=btc) == trades
+    del buchfink_db.read_events_entries
+
+    # Files without the asset or outside of the time range are skipped
+    assert buchfink_db.get_local_trades_for_account('exchange1', asset=eth) == []
+    assert buchfink_db.get_local_trades_for_account('exchange1', from_ts=index['max_ts'] + 1) \
+        == []
+    assert buchfink_db.get_local_trades_for_account('exchange1', asset=btc,
+            to_ts=index['min_ts']) == trades[:1]
+
+    # A query without an index also fills the events cache
+    for cache in ('events', 'index'):
+        shutil.rmtree(tmp_path / 'buchfink' / '.buchfink' / cache)
+    assert buchfink_db.get_local_trades_for_account('exchange1', to_ts=index['min_ts']) \
+        == trades[:1]
+    assert os.listdir(tmp_path / 'buchfink' / '.buchfink' / 'events')
+    assert os.listdir(tmp_path / 'buchfink' / '.buchfink' / 'index')
+
+
+def test_event_store(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    config_file = tmp_path / 'buchfink' / 'buchfink.yaml'
+    config_file.write_text(config_file.read_text() + '  event_store: True\n')
+    buchfink_db = BuchfinkDB(config_file)
+    trades_file = tmp_path / 'buchfink' / 'exchange1.yaml'
+    btc, eth = buchfink_db.get_asset_by_symbol('BTC'), buchfink_db.get_asset_by_symbol('ETH')
+
+    trades = buchfink_db.get_local_trades_for_account('exchange1')
+    assert trades == buchfink_db.parse_trades_file(trades_file)
+    assert os.path.exists(tmp_path / 'buchfink' / '.buchfink' / 'events.sqlite')
+
+    assert buchfink_db.get_local_trades_for_account('exchange1', asset=btc) == trades
+    assert buchfink_db.get_local_trades_for_account('exchange1', asset=eth) == []
+    assert buchfink_db.get_local_trades_for_account('exchange1',
+            from_ts=trades[1].timestamp) == trades[1:]
+
+    # Changed files are synced again
+    trades_file.write_text(trades_file.read_text().replace('16000 USD', '160000 USD'))
+    trades = buchfink_db.get_local_trades_for_account('exchange1')
+    assert str(trades[1].rate) == '160000'
+
+    # Closing the DB also closes the event store
+    event_store = buchfink_db.event_store
+    buchfink_db.__del__()
+    assert 'event_store' not in vars(buchfink_db)
+    with pytest.raises(sqlite3.ProgrammingError):
+        event_store.conn.execute('SELECT 1')
+
+
+def test_write_events(tmp_path):
+    events_file = tmp_path / 'actions.yaml'
+
+    def serialize(events):
+        return [{'income': f'{amount} ETH', 'timestamp': ts} for ts, amount in events]
+
+    def write(events, fingerprint='fingerprint'):
+        write_events(tmp_path, events_file, 'actions', events, fingerprint, serialize)
+        assert events_file.read_text() == yaml_io.dump({'actions': serialize(events)})
+
+    write([(1, 1), (2, 2)])
+
+    # Unchanged events do not touch the file
+    mtime = events_file.stat().st_mtime_ns
+    write([(1, 1), (2, 2)])
+    assert events_file.stat().st_mtime_ns == mtime
+
+    # New events are appended, changed events cause a rewrite
+    write([(1, 1), (2, 2), (3, 3)])
+    write([(1, 1), (2, 5), (3, 3)])
+
+    # Edits to the file cause a rewrite
+    events_file.write_text('actions: []\n')
+    write([(1, 1), (2, 5), (3, 3), (4, 4)])
+
+    # A rewrite with the same contents does not touch the file
+    mtime = events_file.stat().st_mtime_ns
+    write([(1, 1), (2, 5), (3, 3), (4, 4)], fingerprint='other')
+    assert events_file.stat().st_mtime_ns == mtime
+
+
+def test_partitioned_events(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'partitioned'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+    partition_dir = tmp_path / 'buchfink' / 'trades' / 'kraken'
+
+    trades = buchfink_db.get_local_trades_for_account('kraken')
+    assert [trade.link for trade in trades] == ['1', '2', '3']
+
+    # Only the partitions of the requested years are read
+    shutil.rmtree(tmp_path / 'buchfink' / '.buchfink' / 'events')
+    since_2018 = buchfink_db.get_local_trades_for_account('kraken', from_ts=1514764800)
+    assert [trade.link for trade in since_2018] == ['3']
+    assert len(os.listdir(tmp_path / 'buchfink' / '.buchfink' / 'events')) == 1
+
+    until_nov = buchfink_db.get_local_trades_for_account('kraken', to_ts=1509000000)
+    assert [trade.link for trade in until_nov] == ['1']
+
+    # Writing only touches the years that changed and removes empty ones
+    buchfink_db.write_trades('kraken', trades)
+    mtime = (partition_dir / '2018.yaml').stat().st_mtime_ns
+    buchfink_db.write_trades('kraken', trades[1:])
+    assert (partition_dir / '2018.yaml').stat().st_mtime_ns == mtime
+    assert [trade.link for trade in buchfink_db.get_local_trades_for_account('kraken')] \
+        == ['2', '3']
+
+    buchfink_db.write_trades('kraken', trades[2:])
+    assert sorted(os.listdir(partition_dir)) == ['2018.yaml']
+
+
+def test_preload_files(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'partitioned'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+    partition_dir = tmp_path / 'buchfink' / 'trades' / 'kraken'
+
+    # Partitions outside of the time range are not parsed
+    buchfink_db.preload_files(buchfink_db.get_all_accounts(), 2, from_ts=1514764800)
+    assert list(buchfink_db._preloaded) == [str(partition_dir / '2018.yaml')]
+
+    # Documents that were not read are dropped at the end of a command
+    buchfink_db.clear_preloaded()
+    assert not buchfink_db._preloaded
@@ -1,13 +1,19 @@
 'Buchfink cli app integration tests'
+import json
 import logging
 import os
 import os.path
 import shutil
+import socket
+import subprocess
+import sys
+import threading
 
 import pytest
 from click.testing import CliRunner
 
 from buchfink.cli import buchfink
+from buchfink.daemon import BuchfinkDaemon
 
 logger = logging.getLogger(__name__)
 
@@ -125,3 +131,141 @@ def test_ethereum_gas_report_cli():
         assert os.path.exists(os.path.join(d, 'reports/all/report.yaml'))
         assert os.path.exists(os.path.join(d, 'reports/all/all_events.csv'))
         assert os.path.exists(os.path.join(d, 'reports/all/report.md'))
+
+
+def test_commands_are_forwarded_to_daemon():
+    runner = CliRunner()
+    with runner.isolated_filesystem() as d:
+        shutil.copytree(
+                os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+                d,
+                dirs_exist_ok=True
+        )
+        daemon = BuchfinkDaemon(os.path.join(d, 'buchfink.yaml'), buchfink)
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            assert os.path.exists(os.path.join(d, '.buchfink', 'buchfink.sock'))
+            result = runner.invoke(buchfink, ['trades'])
+            logger.debug('output of %s: %s', 'trades', result.output)
+            assert result.exception is None
+            assert result.exit_code == 0
+            assert 'exchange1' in result.output
+        finally:
+            daemon.shutdown()
+            thread.join()
+            daemon.server_close()
+
+        assert not os.path.exists(os.path.join(d, '.buchfink', 'buchfink.sock'))
+
+
+@pytest.mark.parametrize('daemon_hangs', [False, True])
+def test_commands_run_locally_without_daemon_response(monkeypatch, daemon_hangs):
+    monkeypatch.setattr('buchfink.daemon.DAEMON_TIMEOUT', 1)
+    runner = CliRunner()
+    with runner.isolated_filesystem() as d:
+        shutil.copytree(
+                os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+                d,
+                dirs_exist_ok=True
+        )
+        os.makedirs(os.path.join(d, '.buchfink'), exist_ok=True)
+
+        # A daemon that dies or hangs while running the command
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(os.path.join(d, '.buchfink', 'buchfink.sock'))
+        server.listen(1)
+        closed = threading.Event()
+
+        def accept_and_close():
+            conn, _ = server.accept()
+            conn.recv(4096)
+            if daemon_hangs:
+                closed.wait()
+            conn.close()
+
+        thread = threading.Thread(target=accept_and_close)
+        thread.start()
+        try:
+            result = runner.invoke(buchfink, ['trades'])
+        finally:
+            closed.set()
+            thread.join()
+            server.close()
+
+        assert result.exception is None
+        assert result.exit_code == 0
+        assert 'exchange1' in result.output
+
+
+def test_cli_does_not_import_heavy_modules():
+    "Heavy modules should only be imported by the commands that need them"
+    script = 'import sys, buchfink.cli; print(" ".join(sorted(sys.modules)))'
+    modules = subprocess.run(
+        [sys.executable, '-c', script],
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout.split()
+
+    for module in ('buchfink.db', 'rotkehlchen', 'web3', 'pandas', 'pyqrcode', 'webbrowser'):
+        assert module not in modules
+
+
+def test_timings():
+    runner = CliRunner()
+    with runner.isolated_filesystem() as d:
+        shutil.copytree(
+                os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+                d,
+                dirs_exist_ok=True
+        )
+        result = runner.invoke(buchfink, ['--timings-file', 'timings.json', 'trades'])
+        assert result.exception is None
+        assert result.exit_code == 0
+
+        with open(os.path.join(d, 'timings.json')) as timings_file:
+            phases = {timing['phase']: timing for timing in json.load(timings_file)}
+
+        assert phases['cli.trades']['calls'] == 1
+        assert phases['db.load_config']['calls'] == 1
+        assert phases['db.load_trades']['calls'] == 2
+
+
+def test_timings_table():
+    runner = CliRunner()
+    with runner.isolated_filesystem() as d:
+        shutil.copytree(
+                os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+                d,
+                dirs_exist_ok=True
+        )
+        # The bare flag must not swallow the command name
+        result = runner.invoke(buchfink, ['--timings', 'trades'])
+        assert result.exception is None
+        assert result.exit_code == 0
+        assert 'cli.trades' in result.output
+
+
+def test_trades_with_jobs():
+    runner = CliRunner()
+    with runner.isolated_filesystem() as d:
+        shutil.copytree(
+                os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+                d,
+                dirs_exist_ok=True
+        )
+        result = runner.invoke(
+            buchfink, ['--timings-file', 'timings.json', 'trades', '--jobs', '2']
+        )
+        assert result.exception is None
+        assert result.exit_code == 0
+
+        with open(os.path.join(d, 'timings.json')) as timings_file:
+            phases = {timing['phase']: timing for timing in json.load(timings_file)}
+        assert phases['db.preload_files']['calls'] == 1
+
+        # The second run is served from the events cache and does not need a pool
+        second = runner.invoke(buchfink, ['--no-daemon', 'trades', '--jobs', '2'])
+        assert second.exit_code == 0
+        assert second.output == result.output
@@ -2,6 +2,7 @@ import os.path
 import shutil
 
 import pytest
+from rotkehlchen.constants.resolver import ChainID
 from rotkehlchen.types import SupportedBlockchain
 
 from buchfink.datatypes import FVal
@@ -31,6 +32,24 @@ def test_custom_ethereum_token(tmp_path):
         ) is not None
     )
     assert buchfink_db.get_asset_by_symbol("FANTASY") is not None
+    assert os.path.exists(os.path.join(tmp_path, "buchfink/.buchfink/tokens.json"))
+
+    # Second sync is a no-op, tokens are still there
+    buchfink_db.sync_config_tokens()
+    assert buchfink_db.get_asset_by_symbol("FANTASY") is not None
+
+    # Tokens that went missing from the global DB are added again
+    buchfink_db.globaldb.delete_evm_token(
+        address='0x1111111111111111111111111111111111111111',
+        chain_id=ChainID.ETHEREUM
+    )
+    assert not buchfink_db.has_global_assets(
+        ["eip155:1/erc20:0x1111111111111111111111111111111111111111"]
+    )
+    buchfink_db.sync_config_tokens()
+    assert buchfink_db.has_global_assets(
+        ["eip155:1/erc20:0x1111111111111111111111111111111111111111"]
+    )
 
 
 def test_if_we_have_enough_rpc_nodes(tmp_path):
@@ -53,11 +72,104 @@ def test_if_ignored_assets_are_added(tmp_path):
         os.path.join(os.path.dirname(__file__), "scenarios", "ignored_assets"),
         os.path.join(tmp_path, "buchfink"),
     )
-    buchfink_db = BuchfinkDB(os.path.join(tmp_path, "buchfink/buchfink.yaml"))
+    config_file = os.path.join(tmp_path, "buchfink/buchfink.yaml")
+    with open(config_file, 'a') as config:
+        # Bare addresses do not have to be checksummed
+        config.write("    - '0x4af9ab04615cb91e2ee8cbedb43fb52ed205041b'\n")
+
+    buchfink_db = BuchfinkDB(config_file)
     buchfink_db.sync_config_assets()
     with buchfink_db.conn.read_ctx() as cursor:
         ignored_assets = buchfink_db.get_ignored_assets(cursor)
         ignored_identifiers = {asset.identifier for asset in ignored_assets}
 
-    assert len(ignored_assets) >= 3
+    assert len(ignored_assets) >= 4
     assert 'eip155:1/erc20:0x426CA1eA2406c07d75Db9585F22781c096e3d0E0' in ignored_identifiers
+    assert 'eip155:1/erc20:0x4AF9ab04615cB91e2EE8cbEDb43fb52eD205041B' in ignored_identifiers
+
+    # A second sync does not add anything
+    buchfink_db.sync_ignored_assets()
+    with buchfink_db.conn.read_ctx() as cursor:
+        assert len(buchfink_db.get_ignored_assets(cursor)) == len(ignored_assets)
+
+
+def test_subsystems_are_initialized_lazily(tmp_path):
+    shutil.copytree(
+        os.path.join(os.path.dirname(__file__), "scenarios", "ethereum"),
+        os.path.join(tmp_path, "buchfink"),
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, "buchfink/buchfink.yaml"))
+    assert len(buchfink_db.get_all_accounts()) == 1
+    assert 'ethereum_inquirer' not in vars(buchfink_db)
+    assert 'inquirer' not in vars(buchfink_db)
+
+    assert buchfink_db.historian is not None
+    assert 'ethereum_inquirer' not in vars(buchfink_db)
+
+
+def test_rpc_nodes_are_only_synced_on_change(tmp_path):
+    shutil.copytree(
+        os.path.join(os.path.dirname(__file__), "scenarios", "custom_token"),
+        os.path.join(tmp_path, "buchfink"),
+    )
+    config_file = os.path.join(tmp_path, "buchfink/buchfink.yaml")
+    buchfink_db = BuchfinkDB(config_file)
+    num_nodes = len(buchfink_db.get_rpc_nodes(blockchain=SupportedBlockchain.ETHEREUM))
+    buchfink_db.__del__()
+
+    assert os.path.exists(os.path.join(tmp_path, "buchfink/.buchfink/rpc_nodes.json"))
+
+    buchfink_db = BuchfinkDB(config_file)
+    assert len(buchfink_db.get_rpc_nodes(blockchain=SupportedBlockchain.ETHEREUM)) == num_nodes
+    buchfink_db.__del__()
+
+    with open(config_file, 'a') as config:
+        config.write("  rpc_nodes:\n")
+        config.write("    - name: my-node\n")
+        config.write("      endpoint: http://localhost:8545\n")
+
+    buchfink_db = BuchfinkDB(config_file)
+    nodes = buchfink_db.get_rpc_nodes(blockchain=SupportedBlockchain.ETHEREUM)
+    assert len(nodes) == num_nodes + 1
+    assert 'my-node' in [node.node_info.name for node in nodes]
+
+    # The configured node gets its weight, the bundled nodes share the rest
+    weights = {node.node_info.name: node.weight for node in nodes}
+    assert weights['my-node'] == FVal('0.4')
+    assert abs(sum(weights.values(), FVal(0)) - 1) < FVal('1e-9')
+    buchfink_db.__del__()
+
+    # A node clashing with a bundled one does not replace it
+    bundled = next(node for node in nodes if not node.node_info.owned)
+    with open(config_file, 'a') as config:
+        config.write(f"    - name: {bundled.node_info.name}\n")
+        config.write("      endpoint: http://localhost:8546\n")
+
+    buchfink_db = BuchfinkDB(config_file)
+    nodes = buchfink_db.get_rpc_nodes(blockchain=SupportedBlockchain.ETHEREUM)
+    assert len(nodes) == num_nodes + 1
+    assert bundled.node_info.endpoint in [node.node_info.endpoint for node in nodes]
+
+
+def test_assets_updates_are_throttled(tmp_path):
+    shutil.copytree(
+        os.path.join(os.path.dirname(__file__), "scenarios", "custom_token"),
+        os.path.join(tmp_path, "buchfink"),
+    )
+    config_file = os.path.join(tmp_path, "buchfink/buchfink.yaml")
+    buchfink_db = BuchfinkDB(config_file)
+    buchfink_db.perform_assets_updates()
+    assert 'assets_updater' in vars(buchfink_db)
+    buchfink_db.__del__()
+
+    buchfink_db = BuchfinkDB(config_file)
+    buchfink_db.perform_assets_updates()
+    assert 'assets_updater' not in vars(buchfink_db)
+    assert buchfink_db.get_asset_by_symbol("FANTASY") is not None
+
+    fingerprint = buchfink_db.get_events_fingerprint()
+    buchfink_db.perform_assets_updates(force=True)
+    assert 'assets_updater' in vars(buchfink_db)
+
+    # An update that did not change the asset database keeps cached events
+    assert buchfink_db.get_events_fingerprint() == fingerprint
@@ -2,6 +2,7 @@ import os.path
 import shutil
 
 import pytest
+from rotkehlchen.history.types import HistoricalPriceOracle
 
 from buchfink.db import BuchfinkDB
 from buchfink.report import render_report, run_report
@@ -129,3 +130,34 @@ def test_ethereum_gas_report(tmp_path):
         assert '## Events' in report_contents
         assert '0.0203' in report_contents
         assert '-20.35' in report_contents
+
+
+def test_manual_prices_are_synced_incrementally(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'ledger_actions'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    config_file = os.path.join(tmp_path, 'buchfink/buchfink.yaml')
+
+    def manual_prices(buchfink_db):
+        with buchfink_db.globaldb.conn.read_ctx() as cursor:
+            cursor.execute(
+                'SELECT price FROM price_history WHERE source_type=?',
+                (HistoricalPriceOracle.MANUAL.serialize_for_db(),)
+            )
+            return [entry[0] for entry in cursor]
+
+    buchfink_db = BuchfinkDB(config_file)
+    buchfink_db.sync_manual_prices()
+    buchfink_db.sync_manual_prices()
+    assert manual_prices(buchfink_db) == ['0.01']
+    buchfink_db.__del__()
+
+    with open(config_file, 'r') as config:
+        contents = config.read()
+    with open(config_file, 'w') as config:
+        config.write(contents.replace('price: 0.01', 'price: 0.02'))
+
+    buchfink_db = BuchfinkDB(config_file)
+    buchfink_db.sync_manual_prices()
+    assert manual_prices(buchfink_db) == ['0.02']
@@ -3,6 +3,7 @@ import shutil
 
 import pytest
 
+from buchfink.datatypes import Balance, BalanceSheet, FVal
 from buchfink.db import BuchfinkDB
 from buchfink.report import run_report
 
@@ -56,6 +57,10 @@ def test_ledger_actions_income(tmp_path):
     assert len(ledger_actions) == 1
     assert len(trades) == 1
 
+    events = buchfink_db.iter_local_ledger_actions_for_account(accounts[0])
+    assert next(events) == ledger_actions[0]
+    assert next(events, None) is None
+
     report_config = list(buchfink_db.get_all_reports())[0]
     result = run_report(buchfink_db, accounts, report_config)
 
@@ -95,3 +100,97 @@ def test_ledger_actions_gift(tmp_path):
     result = run_report(buchfink_db, accounts, report_config)
 
     assert float(result['overview']['trade']['taxable']) == pytest.approx(2092.35, rel=0.1)
+
+
+def test_unknown_exchange(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'exchanges'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+
+    with pytest.raises(ValueError):
+        buchfink_db.get_exchange('moon')
+
+
+@pytest.mark.blockchain_data
+def test_exchanges_are_cached(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'exchanges'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+
+    exchange = buchfink_db.get_exchange('kraken')
+
+    assert exchange.name == 'kraken'
+    assert buchfink_db.get_exchange('kraken') is exchange
+
+
+def test_write_balances(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'exchanges'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+    account = buchfink_db.get_all_accounts()[0]
+    path = buchfink_db.balances_directory / (account.name + '.yaml')
+    path.write_text('custom: value\n')
+
+    eth = buchfink_db.get_asset_by_symbol('ETH')
+    sheet = BalanceSheet(assets={eth: Balance(FVal('1.5'))}, liabilities={})
+    buchfink_db.write_balances(account, sheet)
+    assert path.read_text() == "assets:\n- amount: '1.5'\n  asset: ETH\ncustom: value\n"
+
+    # Unchanged balances do not touch the file
+    mtime = path.stat().st_mtime_ns
+    buchfink_db.write_balances(account, sheet)
+    assert path.stat().st_mtime_ns == mtime
+
+    balances = buchfink_db.get_balances_from_file(path, with_prices=False)
+    assert balances.assets[eth].amount == FVal('1.5')
+
+
+def test_find_usd_prices(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'exchanges'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+
+    class CountingInquirer:
+        def __init__(self):
+            self.queried = []
+
+        def find_usd_price(self, asset):
+            self.queried.append(asset)
+            return FVal(2)
+
+    buchfink_db.inquirer = CountingInquirer()
+    eth = buchfink_db.get_asset_by_symbol('ETH')
+    btc = buchfink_db.get_asset_by_symbol('BTC')
+
+    prices = buchfink_db.find_usd_prices([eth, btc, eth, eth])
+    assert prices == {eth: FVal(2), btc: FVal(2)}
+    assert sorted(buchfink_db.inquirer.queried, key=str) == sorted([eth, btc], key=str)
+
+
+def test_invalid_events(tmp_path):
+    shutil.copytree(
+            os.path.join(os.path.dirname(__file__), 'scenarios', 'bullrun'),
+            os.path.join(tmp_path, 'buchfink')
+    )
+    with open(os.path.join(tmp_path, 'buchfink', 'exchange1.yaml'), 'a') as trades_file:
+        trades_file.write(
+            "- buy: 1 NOTANASSET\n  for: 1 BTC\n  timestamp: '2017-12-01T00:00:00'\n"
+        )
+    buchfink_db = BuchfinkDB(os.path.join(tmp_path, 'buchfink/buchfink.yaml'))
+
+    # Trades with unknown assets are skipped
+    assert len(buchfink_db.get_local_trades_for_account('exchange1')) == 2
+
+    # Any other invalid trade is an error
+    with open(os.path.join(tmp_path, 'buchfink', 'exchange1.yaml'), 'a') as trades_file:
+        trades_file.write("- buy: 1 BTC\n  timestamp: '2017-12-01T00:00:00'\n")
+    with pytest.raises(KeyError):
+        buchfink_db.get_local_trades_for_account('exchange1')
@@ -3,19 +3,42 @@ import shutil
 from datetime import datetime, timezone
 from decimal import Decimal
 
+import dateutil.parser
 import pytest
+import yaml
 from rotkehlchen.serialization.deserialize import deserialize_timestamp_from_date
 
-from buchfink.datatypes import Asset, Balance, BalanceSheet, FVal, Trade, TradeType
+from buchfink import yaml_io
+from buchfink.datatypes import (
+    Asset,
+    Balance,
+    BalanceSheet,
+    FVal,
+    LedgerActionType,
+    Trade,
+    TradeType
+)
 from buchfink.db import BuchfinkDB
+from buchfink.exceptions import UnknownAsset
 from buchfink.serialization import (
+    clear_asset_caches,
+    deserialize_actions,
     deserialize_asset,
     deserialize_balance,
+    deserialize_ledger_action,
+    deserialize_ledger_action_type,
+    deserialize_timestamp,
     deserialize_trade,
+    deserialize_trades,
+    get_asset_cache_info,
+    parse_timestamp,
+    parse_timestamps,
     serialize_asset,
     serialize_balance,
     serialize_balances,
     serialize_decimal,
+    serialize_ledger_action,
+    serialize_timestamp,
     serialize_trade
 )
 
@@ -91,6 +114,45 @@ def test_trade_deserialization_various_assets(dummy_trade):
     assert trade.fee == 0
 
 
+@pytest.mark.parametrize('action_type', list(LedgerActionType))
+def test_ledger_action_serialization(buchfink_db, action_type):
+    key = action_type.name.lower()
+    ser_action = {
+        key: '1.5 ETH',
+        'link': 'LINK-123',
+        'notes': 'Test',
+        'timestamp': '2020-01-03T00:00:00+00:00'
+    }
+    action = deserialize_ledger_action(ser_action)
+    assert action.action_type == action_type
+    assert action.asset == Asset('ETH')
+    assert deserialize_ledger_action_type(key) == action_type
+    assert serialize_ledger_action(action) == ser_action
+
+
+def test_batch_deserialization(buchfink_db):
+    trades, errors = deserialize_trades([
+        {'buy': '1 BTC', 'for': '1000 USD', 'timestamp': '2017-01-01T00:00:00+00:00'},
+        {'buy': '1 NOTANASSET', 'for': '1 BTC', 'timestamp': '2017-01-02T00:00:00+00:00'},
+        {'sell': '1 BTC', 'for': '2000 USD', 'timestamp': '2017-01-03T00:00:00+00:00'},
+    ])
+    assert trades[0] == deserialize_trade(
+        {'buy': '1 BTC', 'for': '1000 USD', 'timestamp': '2017-01-01T00:00:00+00:00'}
+    )
+    assert trades[1] is None
+    assert trades[2].quote_asset == Asset('USD')
+    assert [(index, type(exc)) for index, exc in errors] == [(1, UnknownAsset)]
+
+    actions, errors = deserialize_actions([
+        {'income': '1 ETH', 'timestamp': '2017-01-01T00:00:00+00:00'},
+        {'buy': '1 BTC', 'for': '1000 USD', 'timestamp': '2017-01-01T00:00:00+00:00'},
+        {'income': '1 NOTANASSET', 'timestamp': '2017-01-01T00:00:00+00:00'},
+    ], include_trades=False)
+    assert actions[0].asset == Asset('ETH')
+    assert actions[1:] == [None, None]
+    assert [index for index, _ in errors] == [2]
+
+
 def test_datetime_deserialization():
     ts = deserialize_timestamp_from_date('2020-05-05T09:48:52Z', 'iso8601', 'coinbase')
     dt = datetime.fromtimestamp(ts, timezone.utc)
@@ -99,6 +161,25 @@ def test_datetime_deserialization():
     assert dt.day == 5
 
 
+@pytest.mark.parametrize('value', [
+    '2020-05-05T09:48:52+00:00',
+    '2020-05-05T09:48:52Z',
+    '2020-05-05T11:48:52+02:00',
+    '2020-05-05T09:48:52.250000+00:00',
+    '2020-05-05T09:48:52',
+    '2020-05-05',
+    '20200505T094852Z',
+])
+def test_parse_timestamp(value):
+    assert parse_timestamp(value) == int(dateutil.parser.isoparse(value).timestamp())
+
+
+def test_parse_timestamps():
+    timestamps = [1588672132, 1588672132, 0, 1893456000]
+    assert parse_timestamps([serialize_timestamp(ts) for ts in timestamps]) == timestamps
+    assert deserialize_timestamp('1588672132') == 1588672132
+
+
 def test_assets_serialization(tmp_path):
     shutil.copytree(
             os.path.join(os.path.dirname(__file__), 'scenarios', 'mappings'),
@@ -137,6 +218,20 @@ def test_assets_serialization(tmp_path):
     assert 'SDT' in serialize_asset(A_STAKEDAO)
 
 
+def test_asset_caches(buchfink_db):
+    clear_asset_caches()
+
+    assert deserialize_asset('BTC') == deserialize_asset('BTC')
+    assert serialize_asset(Asset('BTC')) == serialize_asset(Asset('BTC')) == 'BTC'
+
+    info = get_asset_cache_info()
+    assert (info['deserialize_asset'].hits, info['deserialize_asset'].misses) == (1, 1)
+    assert (info['serialize_asset'].hits, info['serialize_asset'].misses) == (1, 1)
+
+    clear_asset_caches()
+    assert get_asset_cache_info()['deserialize_asset'].currsize == 0
+
+
 def test_serialize_deserialize_balance(tmp_path):
     shutil.copytree(
             os.path.join(os.path.dirname(__file__), 'scenarios', 'mappings'),
@@ -173,3 +268,19 @@ def test_serialize_balance_sheet(buchfink_db):
     serialized = str(serialize_balances(bs))
     assert 'HEX' in serialized
     assert '1500' in serialized
+
+
+@pytest.mark.parametrize('notes', [
+    'Payment',
+    'Zahlung für Rechnung 2022-1337 (Beratung, Entwicklung und Betrieb der Infrastruktur)',
+    'First line\nSecond line',
+])
+def test_yaml_io_output_matches_pyyaml(notes):
+    contents = {'actions': [
+        {'income': '1000 USDC', 'notes': notes, 'timestamp': '2022-01-01T00:00:00+00:00'},
+        {'spend_fee': '0.1 ETH', 'sequence_index': 12, 'link': '0x' + 64 * 'a'},
+    ]}
+
+    dumped = yaml_io.dump(contents, sort_keys=True)
+    assert dumped == yaml.dump(contents, Dumper=yaml.SafeDumper, sort_keys=True)
+    assert yaml_io.load(dumped) == contents